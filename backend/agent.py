@@ -5,12 +5,15 @@ Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
 import os
-from typing import List, Dict, Any
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
 from ingest import ingest_document, DocumentChunk
 from retriever import VectorRetriever
-from generator import AnswerGenerator
+from generator import AnswerGenerator, BatchingDispatcher
 from memory import ConversationMemory
-from schemas import ChatResponse, Citation
+from schemas import ChatResponse, Citation, RetrievedBatch
 
 
 class RAGAgent:
@@ -23,20 +26,38 @@ class RAGAgent:
         """Initialize RAG agent with all components including memory."""
         self.retriever = VectorRetriever(
             db_path=os.getenv("CHROMA_DB_PATH", "./chroma_db"),
-            embedding_model=os.getenv("EMBEDDING_MODEL", "tfidf")
+            embedding_model=os.getenv("EMBEDDING_MODEL", "tfidf"),
+            m=int(os.getenv("HNSW_M", "24")),
+            ef_construction=int(os.getenv("HNSW_EF_CONSTRUCTION", "128")),
+            ef_search=int(os.getenv("HNSW_EF_SEARCH", "100")),
+            embedding_backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            vector_store=os.getenv("VECTOR_STORE", "chroma"),
+            mmr_min_k=int(os.getenv("MMR_MIN_K", "3")),
+            compile_model=os.getenv("TORCH_COMPILE", "False").lower() == "true"
         )
         self.generator = AnswerGenerator(
-            confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.2"))
+            confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.2")),
+            embedder=self.retriever.embed_query,
+            cache_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        )
+        # Groups concurrent /chat generations; started by the server's event loop
+        self.dispatcher = BatchingDispatcher(
+            self.generator,
+            max_wait=float(os.getenv("CHAT_BATCH_WINDOW_MS", "75")) / 1000
         )
         self.memory = ConversationMemory(
             max_short_term=10,
             max_long_term=100,
-            storage_path="./conversation_history.json"
+            storage_path="./conversation_history.json",
+            # Persist from a background thread so /chat never waits on disk
+            flush_interval=float(os.getenv("MEMORY_FLUSH_INTERVAL", "1.0"))
         )
         self.chunk_size = int(os.getenv("CHUNK_SIZE", "400"))
         self.chunk_overlap = int(os.getenv("CHUNK_OVERLAP", "80"))
         self.top_k = int(os.getenv("TOP_K_RETRIEVAL", "5"))
         self.default_conversation_id = "default"
+        # Serializes vector store writes across upload threads
+        self._store_lock = threading.Lock()
     
     def tool_ingest_documents(self, file_path: str, document_name: str) -> Dict[str, Any]:
         """
@@ -141,7 +162,7 @@ class RAGAgent:
                 "error": str(e)
             }
     
-    def tool_rerank_context(self, query: str, retrieved_chunks: List) -> Dict[str, Any]:
+    def tool_rerank_context(self, query: str, retrieved_chunks: RetrievedBatch) -> Dict[str, Any]:
         """
         TOOL 4: Re-rank retrieved chunks using MMR (Maximal Marginal Relevance).
         
@@ -151,7 +172,7 @@ class RAGAgent:
         
         Args:
             query: User question
-            retrieved_chunks: List of (text, metadata, similarity) tuples
+            retrieved_chunks: RetrievedBatch from vector search
             
         Returns:
             Dictionary with re-ranked chunks
@@ -172,14 +193,14 @@ class RAGAgent:
                 "error": str(e)
             }
     
-    def tool_generate_answer_with_citations(self, query: str, reranked_chunks: List,
-                                            conversation_history: str = "") -> Dict[str, Any]:
+    async def tool_generate_answer_with_citations(self, query: str, reranked_chunks: RetrievedBatch,
+                                                  conversation_history: str = "") -> Dict[str, Any]:
         """
         TOOL 5: Generate answer using LLM with conversation context.
         
         Args:
             query: User question
-            reranked_chunks: List of (text, metadata, similarity) tuples
+            reranked_chunks: Re-ranked RetrievedBatch
             conversation_history: Previous conversation context
             
         Returns:
@@ -188,7 +209,7 @@ class RAGAgent:
         print(f"[AGENT] Tool: generate_answer_with_citations()")
         
         try:
-            result = self.generator.generate_answer(query, reranked_chunks, conversation_history)
+            result = await self.dispatcher.submit(query, reranked_chunks, conversation_history)
             
             return {
                 "status": "success",
@@ -204,6 +225,19 @@ class RAGAgent:
             }
     
     def process_query(self, query: str, conversation_id: str = None) -> ChatResponse:
+        """
+        Synchronous entry point for the RAG pipeline (CLI and scripts).
+        
+        Args:
+            query: User question
+            conversation_id: Optional conversation ID for memory
+            
+        Returns:
+            ChatResponse with answer and citations
+        """
+        return asyncio.run(self.process_query_async(query, conversation_id))
+    
+    async def process_query_async(self, query: str, conversation_id: str = None) -> ChatResponse:
         """
         ORCHESTRATION: Execute complete RAG pipeline with memory.
         
@@ -232,8 +266,11 @@ class RAGAgent:
         # Store user message in memory
         self.memory.add_message(conv_id, "user", query)
         
+        # Retrieval is CPU-bound (query embedding, MMR); keep it off the event loop
+        loop = asyncio.get_running_loop()
+        
         # Step 2: Vector search
-        search_result = self.tool_vector_search(query)
+        search_result = await loop.run_in_executor(None, self.tool_vector_search, query)
         if search_result["status"] != "success":
             error_response = ChatResponse(
                 answer="Error retrieving documents",
@@ -247,11 +284,11 @@ class RAGAgent:
         retrieved_chunks = search_result["chunks"]
         
         # Step 3: Re-rank context
-        rerank_result = self.tool_rerank_context(query, retrieved_chunks)
+        rerank_result = await loop.run_in_executor(None, self.tool_rerank_context, query, retrieved_chunks)
         reranked_chunks = rerank_result.get("chunks", retrieved_chunks)
         
         # Step 4: Generate answer with conversation history
-        gen_result = self.tool_generate_answer_with_citations(
+        gen_result = await self.tool_generate_answer_with_citations(
             query, reranked_chunks, conversation_history
         )
         
@@ -296,28 +333,89 @@ class RAGAgent:
         """
         print(f"\n[AGENT] Starting ingestion pipeline for: {document_name}")
         
-        # Clear existing documents if requested
-        if clear_existing:
-            print("[AGENT] Clearing existing documents...")
-            self.retriever.clear_collection()
-        
         # Step 1: Ingest documents
         ingest_result = self.tool_ingest_documents(file_path, document_name)
         if ingest_result["status"] != "success":
             return ingest_result
         
-        chunks = ingest_result["chunks"]
-        
         # Step 2: Embed and store
-        embed_result = self.tool_embed_chunks(chunks)
+        return self.store_chunks(ingest_result["chunks"], document_name, clear_existing)
+    
+    def store_chunks(self, chunks: List[DocumentChunk], document_name: str,
+                     clear_existing: bool = True) -> Dict[str, Any]:
+        """
+        ORCHESTRATION: Store already-chunked documents.
+        Lets callers chunk elsewhere (e.g. in a worker process) and only
+        embed/store in the process that owns the vector store.
+        
+        Args:
+            chunks: List of DocumentChunk objects
+            document_name: Name stored in metadata
+            clear_existing: Whether to clear existing documents before adding new ones;
+                stored chunks identical to incoming ones are kept, not re-embedded
+            
+        Returns:
+            Dictionary with ingestion results
+        """
+        with self._store_lock:
+            # Clear existing documents if requested
+            if clear_existing:
+                print("[AGENT] Clearing existing documents...")
+                self.retriever.clear_collection(keep_chunks=chunks)
+            
+            # Cached answers and prompts refer to the previous document set
+            if self.generator.cache is not None:
+                self.generator.cache.clear()
+            self.generator.invalidate_prompt_cache()
+            
+            embed_result = self.tool_embed_chunks(chunks)
         if embed_result["status"] != "success":
             return embed_result
         
-        print(f"[AGENT] Ingestion complete. Chunks: {ingest_result['chunks_created']}")
+        print(f"[AGENT] Ingestion complete. Chunks: {len(chunks)}")
         
         return {
             "status": "success",
             "document_name": document_name,
-            "chunks_created": ingest_result["chunks_created"],
-            "total_tokens": ingest_result["total_tokens"]
+            "chunks_created": len(chunks),
+            "total_tokens": sum(chunk.token_count for chunk in chunks)
         }
+    
+    def ingest_and_store_many(self, documents: List[Tuple[str, str]], clear_existing: bool = True,
+                              max_workers: int = 4) -> List[Dict[str, Any]]:
+        """
+        ORCHESTRATION: Ingest several PDFs, overlapping parsing with embedding.
+        Worker threads extract and chunk documents while this thread embeds
+        and stores each one as soon as its chunks are ready.
+        
+        Args:
+            documents: (file_path, document_name) pairs
+            clear_existing: Whether to clear existing documents before adding the new ones
+            max_workers: Number of documents parsed concurrently
+            
+        Returns:
+            One ingestion result dictionary per document, in input order
+        """
+        print(f"\n[AGENT] Starting ingestion pipeline for {len(documents)} documents")
+        
+        if clear_existing:
+            with self._store_lock:
+                print("[AGENT] Clearing existing documents...")
+                self.retriever.clear_collection()
+        
+        results: List[Dict[str, Any]] = [{} for _ in documents]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(self.tool_ingest_documents, file_path, document_name): index
+                for index, (file_path, document_name) in enumerate(documents)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                ingest_result = future.result()
+                if ingest_result["status"] != "success":
+                    results[index] = ingest_result
+                    continue
+                results[index] = self.store_chunks(ingest_result["chunks"], documents[index][1],
+                                                   clear_existing=False)
+        
+        return results
@@ -0,0 +1,99 @@
+"""
+Semantic response cache for RAG system.
+Returns stored answers for near-duplicate questions over the same retrieved context.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Bump when the prompt template changes so stale answers are never served
+CACHE_VERSION = "v2"
+
+
+class SemanticCache:
+    """
+    Caches generated responses keyed by query embedding and retrieved chunk ids.
+    A lookup hits when the closest cached query has cosine similarity above the
+    threshold AND was answered from exactly the same set of chunks.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.92, max_entries: int = 512):
+        """
+        Initialize an empty cache.
+
+        Args:
+            similarity_threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum cached responses (oldest evicted first)
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self._embeddings: Optional[np.ndarray] = None
+        self._keys: List[Tuple[str, frozenset]] = []
+        self._responses: List[Dict] = []
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        """L2-normalize so inner product equals cosine similarity."""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        return embedding / (np.linalg.norm(embedding) + 1e-8)
+
+    @staticmethod
+    def _make_key(chunk_ids: List[str]) -> Tuple[str, frozenset]:
+        return (CACHE_VERSION, frozenset(chunk_ids))
+
+    def lookup(self, query_embedding: np.ndarray, chunk_ids: List[str]) -> Optional[Dict]:
+        """
+        Find a cached response for a semantically equivalent query.
+
+        Args:
+            query_embedding: Embedding of the user question
+            chunk_ids: Ids of the chunks retrieved for this question
+
+        Returns:
+            Copy of the cached response dict, or None on a miss
+        """
+        if self._embeddings is None:
+            return None
+
+        scores = self._embeddings @ self._normalize(query_embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold or self._keys[best] != self._make_key(chunk_ids):
+            return None
+
+        response = dict(self._responses[best])
+        response["citations"] = list(response["citations"])
+        return response
+
+    def insert(self, query_embedding: np.ndarray, chunk_ids: List[str], response: Dict) -> None:
+        """
+        Store a response for later lookups.
+
+        Args:
+            query_embedding: Embedding of the user question
+            chunk_ids: Ids of the chunks the answer was generated from
+            response: Answer dictionary returned by the generator
+        """
+        vector = self._normalize(query_embedding)[None, :]
+        if self._embeddings is None:
+            self._embeddings = vector
+        else:
+            self._embeddings = np.vstack([self._embeddings, vector])
+        self._keys.append(self._make_key(chunk_ids))
+        self._responses.append(dict(response))
+
+        # Evict oldest entries
+        overflow = len(self._responses) - self.max_entries
+        if overflow > 0:
+            self._embeddings = self._embeddings[overflow:]
+            del self._keys[:overflow]
+            del self._responses[:overflow]
+
+    def clear(self) -> None:
+        """Drop all cached responses (e.g. after the document set changes)."""
+        self._embeddings = None
+        self._keys = []
+        self._responses = []
+
+    def __len__(self) -> int:
+        return len(self._responses)
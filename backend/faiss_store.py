@@ -0,0 +1,158 @@
+"""
+FAISS vector store for RAG system.
+Exposes the subset of the ChromaDB collection API used by VectorRetriever.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+import math
+from typing import Dict, List, Optional
+import numpy as np
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# Below this many vectors an exact flat index is both faster and simpler
+IVF_MIN_VECTORS = 200_000
+
+# Product quantization: sub-vectors per embedding and bits per code
+PQ_M = 16
+PQ_NBITS = 8
+
+# Inverted lists probed per query once the IVF index is in use
+IVF_NPROBE = 16
+
+# Upper bound on vectors used to train the IVF-PQ codebooks
+IVF_TRAIN_SAMPLE = 100_000
+
+
+class FaissCollection:
+    """
+    In-memory vector collection backed by a FAISS inner-product index.
+    Uses IndexFlatIP on normalized vectors (inner product == cosine) and
+    switches to a trained IndexIVFPQ once the corpus reaches IVF_MIN_VECTORS.
+    Texts, metadata and the original vectors are kept in side arrays indexed
+    by FAISS row, so results carry exact scores and embeddings.
+    """
+
+    def __init__(self):
+        """Create an empty collection."""
+        if not FAISS_AVAILABLE:
+            raise ImportError("faiss-cpu is required for the FAISS vector store")
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all stored vectors and documents."""
+        self._index = None
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._documents: List[str] = []
+        self._metadatas: List[dict] = []
+        self._embeddings: Optional[np.ndarray] = None
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def _build_ivf_index(self) -> None:
+        """Rebuild the index as IVF-PQ trained on (a sample of) the stored vectors."""
+        count, dim = self._embeddings.shape
+        nlist = int(4 * math.sqrt(count))
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, PQ_M, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+
+        sample = self._embeddings
+        if count > IVF_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(count, IVF_TRAIN_SAMPLE, replace=False)
+            sample = self._embeddings[rows]
+        index.train(sample)
+        index.add(self._embeddings)
+        index.nprobe = IVF_NPROBE
+        self._index = index
+        print(f"✓ FAISS index rebuilt as IVF-PQ (nlist={nlist}, {count} vectors)")
+
+    def get(self, ids: List[str], include: Optional[List[str]] = None) -> dict:
+        """
+        Look up which of the given ids are stored.
+
+        Args:
+            ids: Candidate ids
+            include: Accepted for ChromaDB compatibility; ignored
+
+        Returns:
+            Dictionary with the stored subset of ids
+        """
+        return {"ids": [chunk_id for chunk_id in ids if chunk_id in self._rows]}
+
+    def add(self, ids: List[str], embeddings, metadatas: List[dict], documents: List[str]) -> None:
+        """
+        Add vectors with their documents and metadata.
+
+        Args:
+            ids: Unique id per vector
+            embeddings: Matrix (or nested list) of shape (n, dim)
+            metadatas: Metadata dict per vector
+            documents: Text per vector
+        """
+        vectors = np.array(embeddings, dtype=np.float32, ndmin=2)
+        faiss.normalize_L2(vectors)
+
+        start = len(self._ids)
+        self._rows.update((chunk_id, start + offset) for offset, chunk_id in enumerate(ids))
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        self._metadatas.extend(metadatas)
+        self._embeddings = vectors if self._embeddings is None else np.vstack([self._embeddings, vectors])
+
+        if self._index is None:
+            self._index = faiss.IndexFlatIP(vectors.shape[1])
+
+        dim = vectors.shape[1]
+        if (isinstance(self._index, faiss.IndexFlatIP) and len(self._ids) >= IVF_MIN_VECTORS
+                and dim % PQ_M == 0):
+            self._build_ivf_index()
+        else:
+            self._index.add(vectors)
+
+    def query(self, query_embeddings, n_results: int = 5,
+              include: Optional[List[str]] = None) -> dict:
+        """
+        Find the nearest stored vectors for each query.
+
+        Args:
+            query_embeddings: Matrix (or nested list) of shape (q, dim)
+            n_results: Results per query
+            include: Accepted for ChromaDB compatibility; every field is returned
+
+        Returns:
+            ChromaDB-shaped dict of per-query lists (ids, documents, metadatas,
+            distances as cosine distance, embeddings)
+        """
+        queries = np.array(query_embeddings, dtype=np.float32, ndmin=2)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+
+        k = min(n_results, len(self._ids))
+        if k == 0:
+            for key in results:
+                results[key] = [[] for _ in range(len(queries))]
+            return results
+
+        faiss.normalize_L2(queries)
+        _, rows = self._index.search(queries, k)
+
+        for query, query_rows in zip(queries, rows):
+            query_rows = query_rows[query_rows >= 0]
+            embeddings = self._embeddings[query_rows]
+            # Exact cosine scores (IVF-PQ distances are approximate)
+            similarities = embeddings @ query
+            order = np.argsort(-similarities, kind="stable")
+            query_rows = query_rows[order]
+
+            results["ids"].append([self._ids[row] for row in query_rows])
+            results["documents"].append([self._documents[row] for row in query_rows])
+            results["metadatas"].append([self._metadatas[row] for row in query_rows])
+            results["distances"].append(1.0 - similarities[order])
+            results["embeddings"].append(embeddings[order])
+
+        return results
@@ -5,38 +5,134 @@ Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
 import os
-from typing import List, Tuple
-from PyPDF2 import PdfReader
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
 import re
+from utils_numba import count_words
 
+# Prefer PDFium (C++) for text extraction; PyPDF2 is the pure-Python fallback
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    from PyPDF2 import PdfReader
+    PDFIUM_AVAILABLE = False
 
+# PDFs with fewer pages are extracted serially (pool overhead dominates)
+PARALLEL_EXTRACTION_MIN_PAGES = 8
+EXTRACTION_WORKERS = os.cpu_count() or 1
+
+# Shared worker pool, created on first use to amortize process spawn cost
+_extraction_pool = None
+
+
+def _get_extraction_pool() -> ProcessPoolExecutor:
+    """Return the module-level extraction pool, creating it if needed."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+    return _extraction_pool
+
+
+@dataclass(slots=True)
 class DocumentChunk:
     """Represents a single chunk of a document."""
     
-    def __init__(self, chunk_id: str, text: str, document_name: str, page_number: int, token_count: int):
-        self.chunk_id = chunk_id
-        self.text = text
-        self.document_name = document_name
-        self.page_number = page_number
-        self.token_count = token_count
-        self.metadata = {
-            "document_name": document_name,
-            "page_number": page_number,
-            "chunk_id": chunk_id,
-            "token_count": token_count
+    chunk_id: str
+    text: str
+    document_name: str
+    page_number: int
+    token_count: int
+    
+    @property
+    def metadata(self) -> dict:
+        """Metadata dict for the vector store, built on demand."""
+        return {
+            "document_name": self.document_name,
+            "page_number": self.page_number,
+            "chunk_id": self.chunk_id,
+            "token_count": self.token_count
         }
 
 
+# Whitespace following sentence-ending punctuation
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """
+    Lazily split text into sentences.
+    Yields the same pieces as re.split on sentence boundaries without
+    materializing the whole list.
+    """
+    start = 0
+    for match in _SENTENCE_BOUNDARY_RE.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+
 def estimate_tokens(text: str) -> int:
     """
     Estimate token count using simple word-based heuristic.
     Approximation: 1 token ≈ 1.3 words (OpenAI standard)
     """
-    words = len(text.split())
+    words = count_words(text)
     return max(1, int(words / 1.3))
 
 
-def extract_text_from_pdf(file_path: str) -> Tuple[str, int]:
+def _extract_page_range(args: Tuple[str, int, int]) -> List[str]:
+    """
+    Extract text for pages [start, stop) of a PDF.
+    Runs in a worker process, so the document is reopened there
+    (PDFium handles cannot be pickled).
+    """
+    file_path, start, stop = args
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        texts = []
+        for page_num in range(start, stop):
+            page = pdf[page_num]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+
+def _extract_with_pdfium(file_path: str) -> List[Tuple[int, str]]:
+    """Extract per-page text using pypdfium2, in parallel for large PDFs."""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        total_pages = len(pdf)
+    finally:
+        pdf.close()
+    
+    if total_pages >= PARALLEL_EXTRACTION_MIN_PAGES:
+        # One contiguous page range per worker keeps reopen cost per process low
+        pool = _get_extraction_pool()
+        workers = min(EXTRACTION_WORKERS, total_pages)
+        step = -(-total_pages // workers)
+        ranges = [(file_path, start, min(start + step, total_pages))
+                  for start in range(0, total_pages, step)]
+        page_texts = [text for texts in pool.map(_extract_page_range, ranges) for text in texts]
+    else:
+        page_texts = _extract_page_range((file_path, 0, total_pages))
+    
+    return list(enumerate(page_texts, start=1))
+
+
+def _extract_with_pypdf2(file_path: str) -> List[Tuple[int, str]]:
+    """Extract per-page text using PyPDF2."""
+    reader = PdfReader(file_path)
+    return [(page_num, page.extract_text() or "")
+            for page_num, page in enumerate(reader.pages, start=1)]
+
+
+def extract_text_from_pdf(file_path: str) -> List[Tuple[int, str]]:
     """
     Extract text from PDF file with page tracking.
     
@@ -44,83 +140,93 @@ def extract_text_from_pdf(file_path: str) -> Tuple[str, int]:
         file_path: Path to PDF file
         
     Returns:
-        Tuple of (full_text, total_pages)
+        List of (page_number, page_text) tuples, 1-indexed
     """
     try:
-        reader = PdfReader(file_path)
-        full_text = ""
-        
-        for page_num, page in enumerate(reader.pages):
-            text = page.extract_text()
-            # Add page marker for tracking
-            full_text += f"\n[PAGE {page_num + 1}]\n{text}\n"
-        
-        return full_text, len(reader.pages)
+        if PDFIUM_AVAILABLE:
+            return _extract_with_pdfium(file_path)
+        return _extract_with_pypdf2(file_path)
     except Exception as e:
         raise ValueError(f"Failed to extract PDF: {str(e)}")
 
 
-def chunk_text(text: str, chunk_size: int = 400, overlap: int = 80) -> List[str]:
+def chunk_pages(pages: List[Tuple[int, str]], chunk_size: int = 400, overlap: int = 80) -> List[Tuple[str, int, int]]:
     """
-    Split text into overlapping chunks based on token count.
+    Split page texts into overlapping chunks based on token count.
+    Chunks may span pages; each is tagged with the page it starts on.
     
     Args:
-        text: Full document text
+        pages: List of (page_number, page_text) tuples
         chunk_size: Target tokens per chunk
         overlap: Overlap tokens between chunks
         
     Returns:
-        List of text chunks
+        List of (chunk_text, page_number, token_count) tuples
     """
-    # Split by sentences for better semantic boundaries
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
     chunks = []
-    current_chunk = ""
-    current_tokens = 0
+    # Buffer of (sentence, token_count, page_number); tokens are counted once per sentence
+    buffer = []
+    buffer_tokens = 0
     
-    for sentence in sentences:
-        sentence_tokens = estimate_tokens(sentence)
-        
-        # If adding this sentence exceeds chunk_size, save current chunk
-        if current_tokens + sentence_tokens > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            # Start new chunk with overlap
-            current_chunk = current_chunk[-int(chunk_size * overlap / 100):] + " " + sentence
-            current_tokens = estimate_tokens(current_chunk)
-        else:
-            current_chunk += " " + sentence
-            current_tokens += sentence_tokens
+    for page_num, page_text in pages:
+        # Split by sentences for better semantic boundaries
+        for sentence in iter_sentences(page_text):
+            if not sentence:
+                continue
+            sentence_tokens = estimate_tokens(sentence)
+            
+            # If adding this sentence exceeds chunk_size, save current chunk
+            if buffer_tokens + sentence_tokens > chunk_size and buffer:
+                chunks.append((" ".join(entry[0] for entry in buffer).strip(), buffer[0][2], buffer_tokens))
+                
+                # Start new chunk with trailing sentences covering the overlap
+                keep = 0
+                kept_tokens = 0
+                for entry in reversed(buffer):
+                    if kept_tokens >= overlap:
+                        break
+                    keep += 1
+                    kept_tokens += entry[1]
+                # Always drop at least one sentence so chunks make progress
+                keep = min(keep, len(buffer) - 1)
+                buffer = buffer[len(buffer) - keep:]
+                buffer_tokens = sum(entry[1] for entry in buffer)
+            
+            buffer.append((sentence, sentence_tokens, page_num))
+            buffer_tokens += sentence_tokens
     
     # Add final chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+    if buffer:
+        final_chunk = " ".join(entry[0] for entry in buffer).strip()
+        if final_chunk:
+            chunks.append((final_chunk, buffer[0][2], buffer_tokens))
     
     return chunks
 
 
-def extract_page_number(chunk_text: str) -> int:
+def chunk_text(text: str, chunk_size: int = 400, overlap: int = 80) -> List[Tuple[str, int]]:
     """
-    Extract page number from chunk text (marked during PDF extraction).
+    Split text into overlapping chunks based on token count.
     
     Args:
-        chunk_text: Text chunk with page markers
+        text: Full document text
+        chunk_size: Target tokens per chunk
+        overlap: Overlap tokens between chunks
         
     Returns:
-        Page number (1-indexed)
+        List of (chunk_text, token_count) tuples
     """
-    match = re.search(r'\[PAGE (\d+)\]', chunk_text)
-    if match:
-        return int(match.group(1))
-    return 1
+    return [(chunk, tokens) for chunk, _, tokens in chunk_pages([(1, text)], chunk_size, overlap)]
 
 
-def ingest_document(file_path: str, document_name: str, chunk_size: int = 400, overlap: int = 80) -> List[DocumentChunk]:
+def build_document_chunks(pages: List[Tuple[int, str]], document_name: str,
+                          chunk_size: int = 400, overlap: int = 80) -> List[DocumentChunk]:
     """
-    Complete ingestion pipeline: extract → chunk → create metadata.
+    Chunk extracted pages and create metadata.
+    Pure function of its inputs, so it can run in a worker process.
     
     Args:
-        file_path: Path to PDF file
+        pages: List of (page_number, page_text) tuples from extract_text_from_pdf
         document_name: Name to store in metadata
         chunk_size: Target tokens per chunk
         overlap: Overlap tokens between chunks
@@ -128,18 +234,13 @@ def ingest_document(file_path: str, document_name: str, chunk_size: int = 400, o
     Returns:
         List of DocumentChunk objects
     """
-    # Extract text from PDF
-    full_text, total_pages = extract_text_from_pdf(file_path)
-    
-    # Split into chunks using chunk_text function
-    text_chunks = chunk_text(full_text, chunk_size, overlap)
+    # Split into page-tagged chunks
+    text_chunks = chunk_pages(pages, chunk_size, overlap)
     
     # Create DocumentChunk objects with metadata
     document_chunks = []
-    for idx, text_content in enumerate(text_chunks):
-        page_num = extract_page_number(text_content)
-        token_count = estimate_tokens(text_content)
-        
+    # Token counts come from the chunker's running budget (no re-tokenization)
+    for idx, (text_content, page_num, token_count) in enumerate(text_chunks):
         chunk = DocumentChunk(
             chunk_id=f"{document_name}_{idx}",
             text=text_content,
@@ -150,3 +251,22 @@ def ingest_document(file_path: str, document_name: str, chunk_size: int = 400, o
         document_chunks.append(chunk)
     
     return document_chunks
+
+
+def ingest_document(file_path: str, document_name: str, chunk_size: int = 400, overlap: int = 80) -> List[DocumentChunk]:
+    """
+    Complete ingestion pipeline: extract → chunk → create metadata.
+    
+    Args:
+        file_path: Path to PDF file
+        document_name: Name to store in metadata
+        chunk_size: Target tokens per chunk
+        overlap: Overlap tokens between chunks
+        
+    Returns:
+        List of DocumentChunk objects
+    """
+    # Extract per-page text from PDF
+    pages = extract_text_from_pdf(file_path)
+    
+    return build_document_chunks(pages, document_name, chunk_size, overlap)
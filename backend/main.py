@@ -11,11 +11,14 @@ Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
 import os
+import asyncio
+import shutil
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import uvicorn
 
 # Load environment variables from .env file
@@ -28,6 +31,7 @@ except ImportError:
 # Try to import agent, but provide mock if dependencies fail
 try:
     from agent import RAGAgent
+    from ingest import extract_text_from_pdf, build_document_chunks
     from schemas import ChatRequest, ChatResponse, UploadResponse, HealthResponse
     AGENT_AVAILABLE = True
 except ImportError as e:
@@ -65,11 +69,16 @@ except ImportError as e:
         embedding_model_ready: bool = False
 
 
+# Block size used when streaming uploads to disk
+UPLOAD_BUFFER_SIZE = 1 << 20
+
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG System API",
     description="Retrieval-Augmented Generation for Academic & Research Documents",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes responses (long answers + citations) much faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 # Enable CORS for frontend
@@ -95,6 +104,23 @@ else:
     print("⚠️  Running in demo mode - dependencies not available")
 
 
+@app.on_event("startup")
+async def start_workers():
+    """Create the chunking worker pool and start batching /chat generations."""
+    app.state.ingest_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    if agent:
+        agent.dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_workers():
+    """Shut down the chunking worker pool and the chat dispatcher, and persist memory."""
+    app.state.ingest_pool.shutdown(wait=False, cancel_futures=True)
+    if agent:
+        await agent.dispatcher.stop()
+        agent.memory.flush()
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """
@@ -128,21 +154,33 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
-        # Save uploaded file temporarily
+        # Stream uploaded file to disk in 1 MiB blocks (constant memory),
+        # copying on a worker thread so the event loop is not blocked
+        loop = asyncio.get_running_loop()
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
+            await loop.run_in_executor(None, shutil.copyfileobj, file.file, tmp_file, UPLOAD_BUFFER_SIZE)
             tmp_path = tmp_file.name
         
         # Extract document name (without extension)
         document_name = file.filename.replace('.pdf', '')
         
         if agent:
-            # Ingest document using agent
-            result = agent.ingest_and_store(tmp_path, document_name)
+            # Keep ingestion off the event loop: extraction on a thread (it fans
+            # out to its own process pool), chunking in the ingest process pool,
+            # then embedding/storage on this process' agent
+            try:
+                pages = await loop.run_in_executor(None, extract_text_from_pdf, tmp_path)
+                chunks = await loop.run_in_executor(
+                    app.state.ingest_pool, build_document_chunks,
+                    pages, document_name, agent.chunk_size, agent.chunk_overlap
+                )
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            finally:
+                # Clean up temporary file
+                os.unlink(tmp_path)
             
-            # Clean up temporary file
-            os.unlink(tmp_path)
+            result = await loop.run_in_executor(None, agent.store_chunks, chunks, document_name)
             
             if result["status"] != "success":
                 raise HTTPException(status_code=400, detail=result.get("error", "Ingestion failed"))
@@ -187,7 +225,7 @@ async def chat(request: ChatRequest):
     try:
         if agent:
             # Process query through RAG pipeline with memory
-            response = agent.process_query(
+            response = await agent.process_query_async(
                 request.query, 
                 conversation_id=request.conversation_id
             )
@@ -228,11 +266,14 @@ if __name__ == "__main__":
     host = os.getenv("BACKEND_HOST", "0.0.0.0")
     port = int(os.getenv("BACKEND_PORT", "8000"))
     debug = os.getenv("DEBUG", "False").lower() == "true"
+    # The vector store, conversation memory and answer caches live in-process,
+    # so each worker sees only its own uploads; raise only with a shared store
+    workers = 1 if debug else int(os.getenv("WORKERS", "1"))
     
     print(f"\n{'='*60}")
     print(f"RAG System Backend")
     print(f"{'='*60}")
-    print(f"Starting server on {host}:{port}")
+    print(f"Starting server on {host}:{port} ({workers} worker(s))")
     print(f"API Docs: http://localhost:{port}/docs")
     print(f"{'='*60}\n")
     
@@ -240,5 +281,8 @@ if __name__ == "__main__":
         "main:app",
         host=host,
         port=port,
-        reload=debug
+        reload=debug,
+        workers=workers,
+        loop="uvloop",
+        http="httptools"
     )
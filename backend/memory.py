@@ -3,11 +3,14 @@ Conversation memory module for RAG system.
 Implements short-term and long-term memory for chat context.
 """
 
-import json
 import os
+import time
+import atexit
+import threading
 from datetime import datetime
 from typing import List, Dict, Optional
 from collections import deque
+import orjson
 
 
 class ConversationMemory:
@@ -20,7 +23,8 @@ class ConversationMemory:
     def __init__(self, 
                  max_short_term: int = 10,
                  max_long_term: int = 100,
-                 storage_path: str = "./conversation_history.json"):
+                 storage_path: str = "./conversation_history.json",
+                 flush_interval: Optional[float] = None):
         """
         Initialize memory system.
         
@@ -28,10 +32,18 @@ class ConversationMemory:
             max_short_term: Max messages to keep in short-term memory
             max_long_term: Max messages to persist in long-term storage
             storage_path: Path to JSON file for long-term storage
+            flush_interval: If set, persist from a background thread at most once
+                per this many seconds instead of on every message
         """
         self.max_short_term = max_short_term
         self.max_long_term = max_long_term
         self.storage_path = storage_path
+        self.flush_interval = flush_interval
+        
+        # Guards long_term against the background writer; writes are serialized separately
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._dirty = threading.Event()
         
         # Short-term memory (current session)
         self.short_term: Dict[str, deque] = {}
@@ -39,14 +51,18 @@ class ConversationMemory:
         # Load long-term memory from disk
         self.long_term: Dict[str, List[Dict]] = self._load_long_term()
         
+        if flush_interval is not None:
+            threading.Thread(target=self._flush_loop, name="memory-flush", daemon=True).start()
+            atexit.register(self.flush)
+        
         print(f"✓ Memory initialized (short-term: {max_short_term}, long-term: {max_long_term})")
     
     def _load_long_term(self) -> Dict[str, List[Dict]]:
         """Load long-term memory from disk."""
         if os.path.exists(self.storage_path):
             try:
-                with open(self.storage_path, 'r') as f:
-                    data = json.load(f)
+                with open(self.storage_path, 'rb') as f:
+                    data = orjson.loads(f.read())
                     print(f"✓ Loaded {sum(len(v) for v in data.values())} messages from long-term memory")
                     return data
             except Exception as e:
@@ -54,12 +70,32 @@ class ConversationMemory:
         return {}
     
     def _save_long_term(self):
-        """Save long-term memory to disk."""
-        try:
-            with open(self.storage_path, 'w') as f:
-                json.dump(self.long_term, f, indent=2, default=str)
-        except Exception as e:
-            print(f"Warning: Could not save memory: {e}")
+        """Save long-term memory to disk, or schedule a background save."""
+        self._dirty.set()
+        if self.flush_interval is None:
+            self.flush()
+    
+    def _flush_loop(self):
+        """Background writer: coalesce changes made within flush_interval into one save."""
+        while True:
+            self._dirty.wait()
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def flush(self):
+        """Write pending long-term memory changes to disk."""
+        if not self._dirty.is_set():
+            return
+        with self._write_lock:
+            self._dirty.clear()
+            # Snapshot under the lock; serialize and write outside it
+            with self._lock:
+                snapshot = {conv_id: list(messages) for conv_id, messages in self.long_term.items()}
+            try:
+                with open(self.storage_path, 'wb') as f:
+                    f.write(orjson.dumps(snapshot, default=str, option=orjson.OPT_INDENT_2))
+            except Exception as e:
+                print(f"Warning: Could not save memory: {e}")
     
     def add_message(self, conversation_id: str, role: str, content: str, 
                     metadata: Optional[Dict] = None):
@@ -79,19 +115,20 @@ class ConversationMemory:
             "metadata": metadata or {}
         }
         
-        # Add to short-term memory
-        if conversation_id not in self.short_term:
-            self.short_term[conversation_id] = deque(maxlen=self.max_short_term)
-        self.short_term[conversation_id].append(message)
-        
-        # Add to long-term memory
-        if conversation_id not in self.long_term:
-            self.long_term[conversation_id] = []
-        self.long_term[conversation_id].append(message)
-        
-        # Trim long-term memory if needed
-        if len(self.long_term[conversation_id]) > self.max_long_term:
-            self.long_term[conversation_id] = self.long_term[conversation_id][-self.max_long_term:]
+        with self._lock:
+            # Add to short-term memory
+            if conversation_id not in self.short_term:
+                self.short_term[conversation_id] = deque(maxlen=self.max_short_term)
+            self.short_term[conversation_id].append(message)
+            
+            # Add to long-term memory
+            if conversation_id not in self.long_term:
+                self.long_term[conversation_id] = []
+            self.long_term[conversation_id].append(message)
+            
+            # Trim long-term memory if needed
+            if len(self.long_term[conversation_id]) > self.max_long_term:
+                self.long_term[conversation_id] = self.long_term[conversation_id][-self.max_long_term:]
         
         # Persist to disk
         self._save_long_term()
@@ -142,10 +179,10 @@ class ConversationMemory:
     
     def clear_conversation(self, conversation_id: str):
         """Clear a specific conversation from memory."""
-        if conversation_id in self.short_term:
-            del self.short_term[conversation_id]
-        if conversation_id in self.long_term:
-            del self.long_term[conversation_id]
+        with self._lock:
+            self.short_term.pop(conversation_id, None)
+            removed = self.long_term.pop(conversation_id, None)
+        if removed is not None:
             self._save_long_term()
     
     def get_all_conversations(self) -> List[str]:
@@ -0,0 +1,104 @@
+"""
+Numba-accelerated MMR selection kernel for RAG system.
+Falls back to vectorized NumPy when numba is not installed.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _mmr_select_numpy(relevance: np.ndarray, similarity: np.ndarray, k: int,
+                      lambda_param: float) -> np.ndarray:
+    """Vectorized MMR selection (one masked argmax per step)."""
+    n = relevance.shape[0]
+    remaining = np.ones(n, dtype=bool)
+    selected = np.empty(k, dtype=np.int64)
+
+    # Select first chunk (highest relevance)
+    best = int(np.argmax(relevance))
+    selected[0] = best
+    remaining[best] = False
+
+    # Running maximum similarity to the selected chunks (floored at 0)
+    diversity = np.maximum(similarity[:, best], 0.0)
+
+    for step in range(1, k):
+        scores = lambda_param * relevance - (1 - lambda_param) * diversity
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        selected[step] = best
+        remaining[best] = False
+        np.maximum(diversity, similarity[:, best], out=diversity)
+
+    return selected
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _mmr_select_jit(relevance: np.ndarray, similarity: np.ndarray, k: int,
+                        lambda_param: float) -> np.ndarray:
+        """Greedy MMR selection as a single fused loop (no temporary arrays)."""
+        n = relevance.shape[0]
+        remaining = np.ones(n, dtype=np.bool_)
+        selected = np.empty(k, dtype=np.int64)
+
+        # Select first chunk (highest relevance); first maximum wins ties like np.argmax
+        best = 0
+        for i in range(1, n):
+            if relevance[i] > relevance[best]:
+                best = i
+        selected[0] = best
+        remaining[best] = False
+
+        diversity = np.zeros(n, dtype=similarity.dtype)
+        for i in range(n):
+            if similarity[i, best] > diversity[i]:
+                diversity[i] = similarity[i, best]
+
+        for step in range(1, k):
+            best = -1
+            best_score = -np.inf
+            for i in range(n):
+                if not remaining[i]:
+                    continue
+                score = lambda_param * relevance[i] - (1 - lambda_param) * diversity[i]
+                if best < 0 or score > best_score:
+                    best_score = score
+                    best = i
+            selected[step] = best
+            remaining[best] = False
+            for i in range(n):
+                if similarity[i, best] > diversity[i]:
+                    diversity[i] = similarity[i, best]
+
+        return selected
+
+    # Compile at import so the first query does not pay JIT latency
+    _mmr_select_jit(np.ones(2, dtype=np.float32), np.eye(2, dtype=np.float32), 2, 0.5)
+
+
+def mmr_select(relevance: np.ndarray, similarity: np.ndarray, k: int,
+               lambda_param: float = 0.5) -> np.ndarray:
+    """
+    Greedily select k items by Maximal Marginal Relevance.
+
+    Args:
+        relevance: Cosine similarity of each item to the query, shape (n,)
+        similarity: Pairwise cosine similarity between items, shape (n, n)
+        k: Number of items to select (1 <= k <= n)
+        lambda_param: Balance between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Selected item indices in selection order
+    """
+    if NUMBA_AVAILABLE:
+        return _mmr_select_jit(np.ascontiguousarray(relevance, dtype=np.float32),
+                               np.ascontiguousarray(similarity, dtype=np.float32),
+                               k, float(lambda_param))
+    return _mmr_select_numpy(relevance, similarity, k, lambda_param)
@@ -0,0 +1,113 @@
+"""
+ONNX Runtime embedding backend for RAG system.
+Runs an int8-quantized export of a SentenceTransformer model on CPU.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+import os
+from typing import List, Union
+import numpy as np
+
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Where exported/quantized models are kept between runs
+ONNX_MODEL_DIR = "./onnx_models"
+
+# all-MiniLM-L6-v2 was trained with 256-token inputs
+MAX_SEQ_LENGTH = 256
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+
+
+def build_quantized_model(model_name: str, output_dir: str) -> None:
+    """
+    Export a HuggingFace model to ONNX and quantize its weights to int8.
+
+    Args:
+        model_name: HuggingFace model name
+        output_dir: Directory to write the quantized model and tokenizer to
+    """
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    # Dynamic int8 quantization; VNNI kernels are used where the CPU has them
+    quantizer = ORTQuantizer.from_pretrained(model)
+    config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=config)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+
+class OnnxEmbeddingModel:
+    """
+    Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime.
+    Uses mean pooling over token embeddings, as all-MiniLM-L6-v2 does.
+    """
+
+    def __init__(self, model_name: str, model_dir: str = ONNX_MODEL_DIR):
+        """
+        Load (building on first use) the quantized ONNX model.
+
+        Args:
+            model_name: HuggingFace model name
+            model_dir: Cache directory for exported models
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("optimum[onnxruntime] is required for the ONNX embedding backend")
+
+        path = os.path.join(model_dir, model_name.replace("/", "__"))
+        if not os.path.exists(os.path.join(path, QUANTIZED_FILE_NAME)):
+            print(f"Building quantized ONNX model for {model_name}...")
+            build_quantized_model(model_name, path)
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            path,
+            file_name=QUANTIZED_FILE_NAME,
+            provider="CPUExecutionProvider"
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, normalize_embeddings: bool = False,
+               show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embed one text or a list of texts.
+
+        Args:
+            sentences: Text or list of texts
+            batch_size: Texts per forward pass
+            convert_to_numpy: Accepted for compatibility; output is always NumPy
+            normalize_embeddings: L2-normalize each embedding
+            show_progress_bar: Accepted for compatibility; ignored
+
+        Returns:
+            Embedding vector for a single text, else a (n, dim) matrix
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            inputs = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            token_embeddings = self.model(**inputs).last_hidden_state
+
+            # Mean pooling over real (non-padding) tokens
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+
+        return embeddings[0] if single else embeddings
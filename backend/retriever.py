@@ -4,59 +4,211 @@ Implements vector search and MMR (Maximal Marginal Relevance) re-ranking.
 Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
-from typing import List, Tuple
+import hashlib
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Optional
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
+from schemas import RetrievedBatch
+from onnx_embedder import OnnxEmbeddingModel, ONNX_AVAILABLE
+from mmr_kernel import mmr_select
+from faiss_store import FaissCollection, FAISS_AVAILABLE
+
+# Chunks encoded per forward pass during ingestion
+EMBEDDING_BATCH_SIZE = 64
+
+# Distinct query strings whose embeddings are kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = 2048
+
+
+def _detect_device() -> str:
+    """Pick the fastest available device for the embedding model."""
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def _compile_embedding_model(model: SentenceTransformer, device: str) -> None:
+    """
+    Replace the model's transformer with a torch.compile'd version in place.
+    Compilation happens on a warm-up encode; any failure restores the eager model.
+    
+    Args:
+        model: Loaded SentenceTransformer
+        device: Device the model runs on
+    """
+    if not hasattr(torch, "compile"):
+        print("Warning: torch.compile requires PyTorch 2.x, using eager model")
+        return
+    
+    transformer = model[0]
+    eager_model = transformer.auto_model
+    try:
+        # CUDA graphs ("reduce-overhead") only pay off on GPU; input lengths vary, so compile dynamically
+        mode = "reduce-overhead" if device == "cuda" else "default"
+        transformer.auto_model = torch.compile(eager_model, mode=mode, dynamic=True)
+        model.encode(["warm up"], convert_to_numpy=True, show_progress_bar=False)
+        print(f"✓ Embedding model compiled (torch.compile, mode={mode})")
+    except Exception as e:
+        transformer.auto_model = eager_model
+        print(f"Warning: torch.compile failed ({e}), using eager model")
 
 
 class VectorRetriever:
     """
     Handles vector similarity search and re-ranking.
-    Uses ChromaDB for vector storage and SentenceTransformers for embeddings.
+    Uses ChromaDB (or FAISS) for vector storage and SentenceTransformers for embeddings.
     """
     
-    def __init__(self, db_path: str = "./chroma_db", embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    COLLECTION_NAME = "academic_documents"
+    
+    def __init__(self, db_path: str = "./chroma_db", embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 m: int = 24, ef_construction: int = 128, ef_search: int = 100,
+                 embedding_backend: str = "torch", vector_store: str = "chroma",
+                 mmr_min_k: int = 3, compile_model: bool = False):
         """
         Initialize retriever with embedding model and vector database.
         
         Args:
             db_path: Path to ChromaDB storage
             embedding_model: HuggingFace model name for embeddings
+            m: HNSW graph degree (higher = better recall, more memory)
+            ef_construction: HNSW candidate list size while building the index
+            ef_search: HNSW candidate list size at query time (recall vs latency)
+            embedding_backend: "torch" (SentenceTransformers) or "onnx" (int8 ONNX Runtime on CPU)
+            vector_store: "chroma" (persistent HNSW) or "faiss" (in-memory flat / IVF-PQ)
+            mmr_min_k: Result sets this small are returned in similarity order without MMR
+            compile_model: Compile the transformer with torch.compile (torch backend only)
         """
-        self.embedding_model = SentenceTransformer(embedding_model)
+        self.mmr_min_k = mmr_min_k
+        self.collection_metadata = {
+            "hnsw:space": "cosine",
+            "hnsw:M": m,
+            "hnsw:construction_ef": ef_construction,
+            "hnsw:search_ef": ef_search
+        }
+        
+        self.embedding_model = None
+        if embedding_backend == "onnx":
+            if ONNX_AVAILABLE:
+                self.device = "cpu"
+                self.embedding_model = OnnxEmbeddingModel(embedding_model)
+                print("✓ Embedding model on ONNX Runtime (int8)")
+            else:
+                print("Warning: optimum[onnxruntime] not installed, using SentenceTransformers")
+        
+        if self.embedding_model is None:
+            self.device = _detect_device()
+            self.embedding_model = SentenceTransformer(embedding_model, device=self.device)
+            if self.device == "cuda":
+                # FP16 halves memory traffic and uses tensor cores for the encoder GEMMs
+                self.embedding_model = self.embedding_model.half()
+            self.embedding_model.eval()
+            if compile_model:
+                _compile_embedding_model(self.embedding_model, self.device)
+            print(f"✓ Embedding model on {self.device}")
+        
+        # Repeated questions skip the transformer; ndarrays are unhashable
+        # and mutable, so the cache stores raw float32 bytes
+        self._encode_query_cached = lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._encode_query)
+        
+        self.client = None
+        if vector_store == "faiss":
+            if FAISS_AVAILABLE:
+                self.collection = FaissCollection()
+                print("✓ Using FAISS vector store (in-memory)")
+                return
+            print("Warning: faiss not installed, using ChromaDB")
         
-        # Use EphemeralClient (in-memory) to avoid blocking issues on Apple Silicon
-        # This is faster and doesn't require disk persistence
+        # Persist embeddings so restarts do not re-encode every document; fall
+        # back to an in-memory store if the path cannot be opened
         try:
-            self.client = chromadb.EphemeralClient()
-            print("✓ Using ChromaDB EphemeralClient (in-memory)")
+            self.client = chromadb.PersistentClient(
+                path=db_path,
+                settings=Settings(anonymized_telemetry=False)
+            )
+            print(f"✓ Using ChromaDB PersistentClient ({db_path})")
         except Exception as e:
-            print(f"Warning: ChromaDB init issue: {e}")
-            self.client = chromadb.Client()
+            print(f"Warning: ChromaDB persistent store unavailable ({e}), using in-memory client")
+            self.client = chromadb.EphemeralClient()
         
         # Get or create collection for documents
         self.collection = self.client.get_or_create_collection(
-            name="academic_documents",
-            metadata={"hnsw:space": "cosine"}
+            name=self.COLLECTION_NAME,
+            metadata=self.collection_metadata
         )
     
-    def clear_collection(self) -> None:
-        """Clear all documents from the collection."""
+    @classmethod
+    def autotune(cls, vector_count: int) -> dict:
+        """
+        Suggest HNSW parameters for a corpus of the given size.
+        
+        Args:
+            vector_count: Expected number of stored chunks
+            
+        Returns:
+            Keyword arguments (m, ef_construction, ef_search) for __init__
+        """
+        if vector_count < 10_000:
+            return {"m": 16, "ef_construction": 100, "ef_search": 64}
+        if vector_count < 100_000:
+            return {"m": 24, "ef_construction": 128, "ef_search": 100}
+        if vector_count < 1_000_000:
+            return {"m": 32, "ef_construction": 200, "ef_search": 128}
+        return {"m": 48, "ef_construction": 256, "ef_search": 200}
+    
+    def clear_collection(self, keep_chunks: Optional[List] = None) -> None:
+        """
+        Clear documents from the collection.
+        
+        Args:
+            keep_chunks: Chunks about to be re-added; their stored copies are kept
+                so add_chunks can skip re-embedding them
+        """
+        if self.client is None:
+            self.collection.reset()
+            print("✓ Collection cleared successfully")
+            return
+        
+        keep_ids = {self._content_id(chunk) for chunk in keep_chunks or []}
+        
+        # Empty the collection in place so the HNSW index is not rebuilt
         try:
-            self.client.delete_collection("academic_documents")
+            ids = [chunk_id for chunk_id in self.collection.get(include=[])["ids"]
+                   if chunk_id not in keep_ids]
+            if ids:
+                self.collection.delete(ids=ids)
+            print("✓ Collection cleared successfully")
+            return
+        except Exception as e:
+            print(f"Warning: In-place clear failed ({e}), recreating collection")
+        
+        try:
+            self.client.delete_collection(self.COLLECTION_NAME)
             self.collection = self.client.get_or_create_collection(
-                name="academic_documents",
-                metadata={"hnsw:space": "cosine"}
+                name=self.COLLECTION_NAME,
+                metadata=self.collection_metadata
             )
             print("✓ Collection cleared successfully")
         except Exception as e:
             print(f"Warning: Could not clear collection: {e}")
     
+    @staticmethod
+    def _content_id(chunk) -> str:
+        """Stable id derived from a chunk's source and text."""
+        key = f"{chunk.document_name}\0{chunk.page_number}\0{chunk.text}"
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+    
     def add_chunks(self, chunks: List) -> None:
         """
         Add document chunks to vector database.
+        Chunks already stored (same document, page and text) are not re-embedded.
         
         Args:
             chunks: List of DocumentChunk objects from ingest.py
@@ -64,119 +216,199 @@ class VectorRetriever:
         if not chunks:
             return
         
+        # Content-addressed ids: re-ingesting an unchanged chunk is a no-op
+        unique = {}
+        for chunk in chunks:
+            unique.setdefault(self._content_id(chunk), chunk)
+        existing = set(self.collection.get(ids=list(unique), include=[])["ids"])
+        chunks = [chunk for chunk_id, chunk in unique.items() if chunk_id not in existing]
+        if not chunks:
+            print("✓ All chunks already stored, skipping embedding")
+            return
+        
         # Extract texts and metadata
         texts = [chunk.text for chunk in chunks]
         metadatas = [chunk.metadata for chunk in chunks]
-        ids = [chunk.chunk_id for chunk in chunks]
+        ids = [chunk_id for chunk_id in unique if chunk_id not in existing]
         
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(texts, convert_to_numpy=True)
+        # Generate unit-length embeddings so cosine similarity is a dot product
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         
-        # Add to ChromaDB
+        # Add to ChromaDB (ndarray accepted directly; no per-float Python objects)
         self.collection.add(
             ids=ids,
-            embeddings=embeddings.tolist(),
+            embeddings=embeddings,
             metadatas=metadatas,
             documents=texts
         )
     
-    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, dict, float]]:
+    def _encode_query(self, query: str) -> bytes:
+        """Run the embedding model on a query and return the float32 vector bytes."""
+        embedding = self.embedding_model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(embedding, dtype=np.float32).tobytes()
+    
+    def embed_query(self, query: str) -> np.ndarray:
         """
-        Retrieve top-k most similar chunks using vector similarity.
+        Embed a query into the same space as stored chunks.
+        Results are memoized per query string.
         
         Args:
             query: User question
-            top_k: Number of results to retrieve
             
         Returns:
-            List of (text, metadata, similarity_score) tuples
+            Query embedding vector (read-only)
+        """
+        return np.frombuffer(self._encode_query_cached(query), dtype=np.float32)
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode several texts in one batched forward pass (normalized float32 rows)."""
+        embeddings = self.embedding_model.encode(
+            queries,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    
+    def search_batch(self, queries: List[str], top_k: int = 5,
+                     query_embeddings: Optional[np.ndarray] = None) -> List[RetrievedBatch]:
+        """
+        Retrieve top-k chunks for several queries with one encode and one query call.
+        
+        Args:
+            queries: User questions
+            top_k: Number of results to retrieve per query
+            query_embeddings: Precomputed unit-length query embeddings, one row per query
+            
+        Returns:
+            One RetrievedBatch per query, in input order
         """
-        # Embed query
-        query_embedding = self.embedding_model.encode(query, convert_to_numpy=True)
+        if not queries:
+            return []
         
-        # Search in ChromaDB
+        # Embed all queries in a single forward pass
+        if query_embeddings is None:
+            query_embeddings = self._encode_queries(queries)
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        
+        # Search in ChromaDB; fetch stored vectors so MMR need not re-encode chunks
         results = self.collection.query(
-            query_embeddings=[query_embedding.tolist()],
-            n_results=top_k
+            query_embeddings=query_embeddings,
+            n_results=top_k,
+            include=["documents", "metadatas", "distances", "embeddings"]
         )
         
-        # Format results
-        retrieved = []
-        if results and results['documents'] and len(results['documents']) > 0:
-            for i, doc in enumerate(results['documents'][0]):
-                metadata = results['metadatas'][0][i]
-                distance = results['distances'][0][i]
-                # Convert distance to similarity (cosine distance to similarity)
-                similarity = 1 - distance
-                retrieved.append((doc, metadata, similarity))
+        return [self._format_results(results, i, query_embeddings[i]) for i in range(len(queries))]
+    
+    @staticmethod
+    def _format_results(results: dict, index: int, query_embedding: np.ndarray) -> RetrievedBatch:
+        """Convert the results for one query of a Chroma query call into a RetrievedBatch."""
+        # Format results column-wise
+        if not (results and results['documents'] and len(results['documents']) > index):
+            return RetrievedBatch()
+        
+        # Pull each metadata column with C-level iteration
+        metadatas = results['metadatas'][index]
+        return RetrievedBatch(
+            texts=results['documents'][index],
+            doc_names=list(map(itemgetter('document_name'), metadatas)),
+            page_nums=np.fromiter(map(itemgetter('page_number'), metadatas),
+                                  dtype=np.int32, count=len(metadatas)),
+            chunk_ids=list(map(itemgetter('chunk_id'), metadatas)),
+            # Convert distance to similarity (cosine distance to similarity)
+            scores=1.0 - np.asarray(results['distances'][index], dtype=np.float32),
+            embeddings=np.asarray(results['embeddings'][index], dtype=np.float32),
+            query_embedding=query_embedding
+        )
+    
+    def search(self, query: str, top_k: int = 5,
+               query_embedding: Optional[np.ndarray] = None) -> RetrievedBatch:
+        """
+        Retrieve top-k most similar chunks using vector similarity.
+        
+        Args:
+            query: User question
+            top_k: Number of results to retrieve
+            query_embedding: Precomputed unit-length query embedding (skips encoding)
+            
+        Returns:
+            RetrievedBatch of chunks ordered by similarity, carrying the stored
+            chunk embeddings and the query embedding for re-ranking
+        """
+        # Embed query (memoized for single queries)
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
         
-        return retrieved
+        return self.search_batch([query], top_k=top_k, query_embeddings=query_embedding[None, :])[0]
     
-    def rerank_mmr(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]], 
-                   lambda_param: float = 0.5) -> List[Tuple[str, dict, float]]:
+    def rerank_mmr(self, query: str, retrieved_chunks: RetrievedBatch,
+                   lambda_param: float = 0.5,
+                   query_embedding: Optional[np.ndarray] = None,
+                   chunk_embeddings: Optional[np.ndarray] = None) -> RetrievedBatch:
         """
         Re-rank retrieved chunks using Maximal Marginal Relevance (MMR).
         Balances relevance to query with diversity among results.
         
         Args:
             query: User question
-            retrieved_chunks: List of (text, metadata, similarity) from search()
+            retrieved_chunks: RetrievedBatch from search()
             lambda_param: Balance between relevance (1.0) and diversity (0.0)
+            query_embedding: Query embedding (defaults to the one from search());
+                normalized here if given
+            chunk_embeddings: Chunk embeddings (defaults to those from search());
+                normalized here if given
             
         Returns:
-            Re-ranked list of (text, metadata, similarity) tuples
+            Re-ranked RetrievedBatch
         """
-        if len(retrieved_chunks) <= 1:
+        # Too few results for diversity to matter, or relevance dominates anyway
+        if len(retrieved_chunks) <= max(1, self.mmr_min_k) or lambda_param >= 0.95:
             return retrieved_chunks
         
-        # Embed query and all chunks
-        query_embedding = self.embedding_model.encode(query, convert_to_numpy=True)
-        chunk_texts = [chunk[0] for chunk in retrieved_chunks]
-        chunk_embeddings = self.embedding_model.encode(chunk_texts, convert_to_numpy=True)
+        # Only caller-supplied vectors need normalizing: stored chunk vectors
+        # and embed_query() output are already unit length
+        normalize_query = query_embedding is not None
+        normalize_chunks = chunk_embeddings is not None
         
-        # Calculate query relevance scores
-        query_scores = np.dot(chunk_embeddings, query_embedding) / (
-            np.linalg.norm(chunk_embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-8
-        )
+        # Reuse the vectors search() already has; encode only as a fallback
+        if query_embedding is None:
+            query_embedding = retrieved_chunks.query_embedding
+        if query_embedding is None:
+            query_embedding = self.embed_query(query)
+        if chunk_embeddings is None:
+            chunk_embeddings = retrieved_chunks.embeddings
+        if chunk_embeddings is None:
+            chunk_embeddings = self._encode_queries(retrieved_chunks.texts)
         
-        # MMR selection
-        selected_indices = []
-        remaining_indices = list(range(len(retrieved_chunks)))
+        # Contiguous float32 so the matmuls below run as SGEMM without copies
+        chunk_embeddings = np.ascontiguousarray(chunk_embeddings, dtype=np.float32)
+        query_embedding = np.ascontiguousarray(query_embedding, dtype=np.float32)
         
-        # Select first chunk (highest relevance)
-        first_idx = np.argmax(query_scores)
-        selected_indices.append(first_idx)
-        remaining_indices.remove(first_idx)
+        # Cosine similarity is then a plain dot product
+        if normalize_chunks:
+            chunk_embeddings = chunk_embeddings / (np.linalg.norm(chunk_embeddings, axis=1, keepdims=True) + 1e-8)
+        if normalize_query:
+            query_embedding = query_embedding / (np.linalg.norm(query_embedding) + 1e-8)
         
-        # Iteratively select chunks that maximize MMR
-        while remaining_indices:
-            mmr_scores = []
-            
-            for idx in remaining_indices:
-                # Relevance to query
-                relevance = query_scores[idx]
-                
-                # Diversity: minimum similarity to already selected chunks
-                diversity = 0
-                for selected_idx in selected_indices:
-                    similarity = np.dot(chunk_embeddings[idx], chunk_embeddings[selected_idx]) / (
-                        np.linalg.norm(chunk_embeddings[idx]) * np.linalg.norm(chunk_embeddings[selected_idx]) + 1e-8
-                    )
-                    diversity = max(diversity, similarity)
-                
-                # MMR score
-                mmr = lambda_param * relevance - (1 - lambda_param) * diversity
-                mmr_scores.append(mmr)
-            
-            # Select chunk with highest MMR
-            best_idx = remaining_indices[np.argmax(mmr_scores)]
-            selected_indices.append(best_idx)
-            remaining_indices.remove(best_idx)
+        # Relevance to query and pairwise chunk similarity in two matmuls
+        query_scores = chunk_embeddings @ query_embedding
+        similarity = chunk_embeddings @ chunk_embeddings.T
+        
+        # Greedy MMR selection over every retrieved chunk
+        selected_indices = mmr_select(query_scores, similarity, len(retrieved_chunks), lambda_param)
         
         # Return re-ranked chunks
-        return [retrieved_chunks[i] for i in selected_indices]
+        return retrieved_chunks.select(selected_indices)
     
-    def retrieve_and_rerank(self, query: str, top_k: int = 5) -> List[Tuple[str, dict, float]]:
+    def retrieve_and_rerank(self, query: str, top_k: int = 5) -> RetrievedBatch:
         """
         Complete retrieval pipeline: search → re-rank.
         
@@ -185,12 +417,13 @@ class VectorRetriever:
             top_k: Number of results to retrieve
             
         Returns:
-            Re-ranked list of (text, metadata, similarity) tuples
+            Re-ranked RetrievedBatch
         """
-        # Step 1: Vector similarity search
-        retrieved = self.search(query, top_k=top_k)
+        # Step 1: Vector similarity search (encodes the query once)
+        query_embedding = self.embed_query(query)
+        retrieved = self.search(query, top_k=top_k, query_embedding=query_embedding)
         
-        # Step 2: MMR re-ranking for diversity
+        # Step 2: MMR re-ranking for diversity, reusing the search vectors
         reranked = self.rerank_mmr(query, retrieved)
         
         return reranked
@@ -1,15 +1,53 @@
 """
-Pydantic schemas for RAG system API requests and responses.
+Pydantic schemas for RAG system API requests and responses,
+plus the internal container for retrieval results.
 Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime
+from dataclasses import dataclass, field
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Sequence
+from datetime import datetime, timezone
+import numpy as np
+
+
+@dataclass
+class RetrievedBatch:
+    """
+    Retrieved chunks stored column-wise (struct of arrays).
+    Row i is chunk i across every field, in ranking order.
+    """
+    texts: List[str] = field(default_factory=list)
+    doc_names: List[str] = field(default_factory=list)
+    page_nums: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    chunk_ids: List[str] = field(default_factory=list)
+    scores: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+    # Stored chunk vectors (one row per chunk) and the query vector, when the
+    # retriever has them, so re-ranking and caching need not re-encode
+    embeddings: Optional[np.ndarray] = None
+    query_embedding: Optional[np.ndarray] = None
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def select(self, indices: Sequence[int]) -> "RetrievedBatch":
+        """Return a new batch containing the given rows in the given order."""
+        indices = list(indices)
+        return RetrievedBatch(
+            texts=[self.texts[i] for i in indices],
+            doc_names=[self.doc_names[i] for i in indices],
+            page_nums=self.page_nums[indices],
+            chunk_ids=[self.chunk_ids[i] for i in indices],
+            scores=self.scores[indices],
+            embeddings=self.embeddings[indices] if self.embeddings is not None else None,
+            query_embedding=self.query_embedding
+        )
 
 
 class Citation(BaseModel):
     """Citation metadata for retrieved content."""
+    model_config = ConfigDict(frozen=True)
+    
     document: str = Field(..., description="Name of the source document")
     page: int = Field(..., description="Page number in the document")
     chunk_id: str = Field(..., description="Unique chunk identifier")
@@ -17,6 +55,8 @@ class Citation(BaseModel):
 
 class ChatRequest(BaseModel):
     """User query request."""
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+    
     query: str = Field(..., min_length=1, max_length=1000, description="User question")
     conversation_id: Optional[str] = Field(None, description="Optional conversation ID for multi-turn")
 
@@ -40,6 +80,6 @@ class UploadResponse(BaseModel):
 class HealthResponse(BaseModel):
     """Health check response."""
     status: str = Field(default="healthy", description="System status")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     vector_db_ready: bool = Field(..., description="Vector database status")
     embedding_model_ready: bool = Field(..., description="Embedding model status")
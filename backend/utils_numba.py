@@ -0,0 +1,47 @@
+"""
+Numba-accelerated text helpers for RAG system.
+Falls back to pure Python when numba is not installed.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _count_words_u8(buf: np.ndarray) -> int:
+        """Count whitespace-separated words in a UTF-8 byte buffer."""
+        count = 0
+        in_word = False
+        for byte in buf:
+            # ASCII whitespace as recognized by str.split()
+            if byte == 32 or 9 <= byte <= 13 or 28 <= byte <= 31:
+                in_word = False
+            elif not in_word:
+                in_word = True
+                count += 1
+        return count
+
+    # Compile at import so the first document does not pay JIT latency
+    _count_words_u8(np.frombuffer(b"warm up", dtype=np.uint8))
+
+
+def count_words(text: str) -> int:
+    """
+    Count whitespace-separated words without allocating a list of words.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Number of words
+    """
+    if NUMBA_AVAILABLE:
+        return int(_count_words_u8(np.frombuffer(text.encode("utf-8"), dtype=np.uint8)))
+    return len(text.split())
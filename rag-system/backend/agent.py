@@ -5,7 +5,8 @@ Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
 import os
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Optional
 from ingest import ingest_document, DocumentChunk
 from retriever import VectorRetriever
 from generator import AnswerGenerator
@@ -26,7 +27,14 @@ class RAGAgent:
             embedding_model=os.getenv("EMBEDDING_MODEL", "tfidf")
         )
         self.generator = AnswerGenerator(
-            confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.2"))
+            confidence_threshold=float(os.getenv("CONFIDENCE_THRESHOLD", "0.2")),
+            request_timeout=float(os.getenv("GEMINI_TIMEOUT", "30")),
+            map_reduce_min_chunks=int(os.getenv("MAP_REDUCE_MIN_CHUNKS", "6")),
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+            rate_limit_qpm=int(os.getenv("GEMINI_RATE_LIMIT_QPM", "500")),
+            max_context_chars=int(os.getenv("MAX_CONTEXT_CHARS", "8000")),
+            max_chunk_chars=int(os.getenv("MAX_CHUNK_CHARS", "2000")),
+            max_context_tokens=int(os.getenv("MAX_CONTEXT_TOKENS", "2000"))
         )
         self.memory = ConversationMemory(
             max_short_term=10,
@@ -127,7 +135,8 @@ class RAGAgent:
         print(f"[AGENT] Tool: vector_search(query='{query[:50]}...')")
         
         try:
-            retrieved = self.retriever.search(query, top_k=self.top_k)
+            # Over-fetch so MMR re-ranking can choose a diverse top_k
+            retrieved = self.retriever.search(query, top_k=self.retriever.mmr_candidate_count(self.top_k))
             
             return {
                 "status": "success",
@@ -159,7 +168,7 @@ class RAGAgent:
         print(f"[AGENT] Tool: rerank_context({len(retrieved_chunks)} chunks)")
         
         try:
-            reranked = self.retriever.rerank_mmr(query, retrieved_chunks)
+            reranked = self.retriever.rerank_mmr(query, retrieved_chunks, top_k=self.top_k)
             
             return {
                 "status": "success",
@@ -172,8 +181,8 @@ class RAGAgent:
                 "error": str(e)
             }
     
-    def tool_generate_answer_with_citations(self, query: str, reranked_chunks: List,
-                                            conversation_history: str = "") -> Dict[str, Any]:
+    async def tool_generate_answer_with_citations(self, query: str, reranked_chunks: List,
+                                                  conversation_history: str = "") -> Dict[str, Any]:
         """
         TOOL 5: Generate answer using LLM with conversation context.
         
@@ -188,7 +197,7 @@ class RAGAgent:
         print(f"[AGENT] Tool: generate_answer_with_citations()")
         
         try:
-            result = self.generator.generate_answer(query, reranked_chunks, conversation_history)
+            result = await self.generator.agenerate_answer(query, reranked_chunks, conversation_history)
             
             return {
                 "status": "success",
@@ -204,6 +213,19 @@ class RAGAgent:
             }
     
     def process_query(self, query: str, conversation_id: str = None) -> ChatResponse:
+        """
+        Synchronous entry point for the RAG pipeline (CLI and scripts).
+        
+        Args:
+            query: User question
+            conversation_id: Optional conversation ID for memory
+            
+        Returns:
+            ChatResponse with answer and citations
+        """
+        return asyncio.run(self.process_query_async(query, conversation_id))
+    
+    async def process_query_async(self, query: str, conversation_id: str = None) -> ChatResponse:
         """
         ORCHESTRATION: Execute complete RAG pipeline with memory.
         
@@ -230,28 +252,22 @@ class RAGAgent:
             print(f"[AGENT] Found conversation history ({len(conversation_history)} chars)")
         
         # Store user message in memory
-        self.memory.add_message(conv_id, "user", query)
+        await self.memory.add_message(conv_id, "user", query)
         
-        # Step 2: Vector search
-        search_result = self.tool_vector_search(query)
-        if search_result["status"] != "success":
+        # Steps 2-3: Vector search and re-ranking
+        reranked_chunks = await self._retrieve_context(query)
+        if reranked_chunks is None:
             error_response = ChatResponse(
                 answer="Error retrieving documents",
                 citations=[],
                 confidence=0.0,
                 retrieved_chunks=0
             )
-            self.memory.add_message(conv_id, "assistant", error_response.answer)
+            await self.memory.add_message(conv_id, "assistant", error_response.answer)
             return error_response
         
-        retrieved_chunks = search_result["chunks"]
-        
-        # Step 3: Re-rank context
-        rerank_result = self.tool_rerank_context(query, retrieved_chunks)
-        reranked_chunks = rerank_result.get("chunks", retrieved_chunks)
-        
         # Step 4: Generate answer with conversation history
-        gen_result = self.tool_generate_answer_with_citations(
+        gen_result = await self.tool_generate_answer_with_citations(
             query, reranked_chunks, conversation_history
         )
         
@@ -262,7 +278,7 @@ class RAGAgent:
                 confidence=0.0,
                 retrieved_chunks=len(reranked_chunks)
             )
-            self.memory.add_message(conv_id, "assistant", error_response.answer)
+            await self.memory.add_message(conv_id, "assistant", error_response.answer)
             return error_response
         
         # Build response
@@ -274,7 +290,7 @@ class RAGAgent:
         )
         
         # Store assistant response in memory
-        self.memory.add_message(conv_id, "assistant", response.answer, {
+        await self.memory.add_message(conv_id, "assistant", response.answer, {
             "confidence": response.confidence,
             "citations": len(response.citations)
         })
@@ -282,6 +298,61 @@ class RAGAgent:
         print(f"[AGENT] Pipeline complete. Confidence: {response.confidence:.2f}")
         return response
     
+    async def process_query_stream(self, query: str, conversation_id: str = None):
+        """
+        ORCHESTRATION: Streaming variant of process_query_async.
+        
+        Args:
+            query: User question
+            conversation_id: Optional conversation ID for memory
+            
+        Yields:
+            Generator events: answer text as it is produced, then the final result
+        """
+        conv_id = conversation_id or self.default_conversation_id
+        print(f"\n[AGENT] Streaming query: '{query}' (conversation: {conv_id})")
+        
+        conversation_history = self.memory.get_conversation_summary(conv_id)
+        await self.memory.add_message(conv_id, "user", query)
+        
+        reranked_chunks = await self._retrieve_context(query)
+        if reranked_chunks is None:
+            answer = "Error retrieving documents"
+            await self.memory.add_message(conv_id, "assistant", answer)
+            yield {"type": "final", "answer": answer, "citations": [], "confidence": 0.0, "retrieved_chunks": 0}
+            return
+        
+        print(f"[AGENT] Tool: stream_answer_with_citations()")
+        async for event in self.generator.astream_answer(query, reranked_chunks, conversation_history):
+            if event["type"] == "final":
+                await self.memory.add_message(conv_id, "assistant", event["answer"], {
+                    "confidence": event["confidence"],
+                    "citations": len(event["citations"])
+                })
+                print(f"[AGENT] Stream complete. Confidence: {event['confidence']:.2f}")
+            yield event
+    
+    async def _retrieve_context(self, query: str) -> Optional[List]:
+        """
+        Run vector search and MMR re-ranking off the event loop.
+        
+        Args:
+            query: User question
+            
+        Returns:
+            Re-ranked (text, metadata, similarity) tuples, or None if search failed
+        """
+        # Retrieval is CPU-bound (TF-IDF, MMR); keep it off the event loop
+        loop = asyncio.get_running_loop()
+        
+        search_result = await loop.run_in_executor(None, self.tool_vector_search, query)
+        if search_result["status"] != "success":
+            return None
+        
+        retrieved_chunks = search_result["chunks"]
+        rerank_result = await loop.run_in_executor(None, self.tool_rerank_context, query, retrieved_chunks)
+        return rerank_result.get("chunks", retrieved_chunks[:self.top_k])
+    
     def ingest_and_store(self, file_path: str, document_name: str, clear_existing: bool = True) -> Dict[str, Any]:
         """
         ORCHESTRATION: Complete ingestion pipeline.
@@ -301,6 +372,9 @@ class RAGAgent:
             print("[AGENT] Clearing existing documents...")
             self.retriever.clear_collection()
         
+        # Cached answers refer to the previous document set
+        self.generator.cache.clear()
+        
         # Step 1: Ingest documents
         ingest_result = self.tool_ingest_documents(file_path, document_name)
         if ingest_result["status"] != "success":
@@ -0,0 +1,99 @@
+"""
+Response cache for RAG system.
+Skips the LLM call when the same question is asked over the same retrieved chunks.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+import os
+import json
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Characters of conversation history that participate in the cache key
+HISTORY_TAIL_CHARS = 500
+
+
+class ResponseCache:
+    """
+    LRU cache of generated responses, persisted to a JSON sidecar file.
+    Keys hash the normalized query, the sorted retrieved chunk ids and the
+    tail of the conversation history; values are JSON-serializable dicts.
+    """
+
+    def __init__(self, max_entries: int = 1024, storage_path: Optional[str] = "./llm_cache.json"):
+        """
+        Initialize the cache, loading previously saved entries.
+
+        Args:
+            max_entries: Maximum cached responses (least recently used evicted first)
+            storage_path: JSON file used by save()/load; None keeps the cache in memory only
+        """
+        self.max_entries = max_entries
+        self.storage_path = storage_path
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._load()
+
+    @staticmethod
+    def make_key(query: str, chunk_ids: List[str], conversation_history: str = "") -> str:
+        """
+        Build a cache key for a question over a set of chunks.
+
+        Args:
+            query: User question
+            chunk_ids: Ids of the retrieved chunks (order-insensitive)
+            conversation_history: Conversation context sent with the prompt
+
+        Returns:
+            Hex digest identifying the request
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(query.strip().lower().encode("utf-8"))
+        digest.update(b"|")
+        digest.update(",".join(sorted(chunk_ids)).encode("utf-8"))
+        digest.update(b"|")
+        digest.update(conversation_history[-HISTORY_TAIL_CHARS:].encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a copy of the cached response, or None on a miss."""
+        response = self._entries.get(key)
+        if response is None:
+            return None
+        self._entries.move_to_end(key)
+        return dict(response)
+
+    def put(self, key: str, response: Dict) -> None:
+        """Store a response, evicting the least recently used entry if full."""
+        self._entries[key] = dict(response)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached responses (e.g. after the document set changes)."""
+        self._entries.clear()
+
+    def _load(self) -> None:
+        """Load saved entries from disk."""
+        if not self.storage_path or not os.path.exists(self.storage_path):
+            return
+        try:
+            with open(self.storage_path, 'r') as f:
+                self._entries.update(json.load(f))
+            print(f"✓ Loaded {len(self._entries)} cached responses")
+        except Exception as e:
+            print(f"Warning: Could not load response cache: {e}")
+
+    def save(self) -> None:
+        """Write the cache to disk."""
+        if not self.storage_path:
+            return
+        try:
+            with open(self.storage_path, 'w') as f:
+                json.dump(self._entries, f)
+        except Exception as e:
+            print(f"Warning: Could not save response cache: {e}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
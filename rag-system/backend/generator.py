@@ -3,45 +3,63 @@ Answer generation module for RAG system.
 Implements LLM-based answer generation with hallucination control.
 """
 
+import io
 import os
 import re
+import asyncio
+import threading
 from typing import List, Tuple, Dict
 import google.generativeai as genai
 from schemas import Citation
+from cache import ResponseCache
 
+try:
+    from aiolimiter import AsyncLimiter
+    AIOLIMITER_AVAILABLE = True
+except ImportError:
+    AIOLIMITER_AVAILABLE = False
 
-class AnswerGenerator:
-    """Generates answers using Google Gemini API."""
-    
-    def __init__(self, api_key: str = None, confidence_threshold: float = 0.2):
-        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.confidence_threshold = confidence_threshold
-        self.model = None
-        
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel("gemini-2.0-flash")
-                print("✓ Gemini LLM initialized successfully")
-            except Exception as e:
-                print(f"Warning: Could not initialize Gemini: {e}")
-                self.model = None
-        else:
-            print("Note: GEMINI_API_KEY not set. Using mock LLM.")
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+
+# One configured client and model per process, shared by every AnswerGenerator
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+
+
+def get_model(api_key: str):
+    """
+    Return the process-wide Gemini model, configuring the client on first use.
     
-    def _build_context_prompt(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]], 
-                               conversation_history: str = "") -> str:
-        """Build prompt with document context."""
-        context_text = "\n\n---\n\n".join([
-            f"[Document: {chunk[1]['document_name']}, Page: {chunk[1]['page_number']}]\n{chunk[0]}"
-            for chunk in retrieved_chunks
-        ]) if retrieved_chunks else "No documents uploaded yet."
+    Args:
+        api_key: Gemini API key
         
-        history_section = ""
-        if conversation_history:
-            history_section = f"\nPREVIOUS CONVERSATION:\n{conversation_history}\n"
-        
-        prompt = f"""You are "RAG Assistant", a document Q&A assistant.
+    Returns:
+        Shared genai.GenerativeModel
+    """
+    global _MODEL
+    with _MODEL_LOCK:
+        if _MODEL is None:
+            genai.configure(api_key=api_key)
+            _MODEL = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        return _MODEL
+
+# Compiled once at import; used on every answer
+_SANITIZE_PATTERNS = (
+    r'\b(trained by|developed by|created by|built by|made by)\s*(google|openai|anthropic|meta|microsoft)\b',
+    r'\b(gemini|gpt-?\d*|claude|llama|palm|bard)\b',
+    r'\bi am (a |an )?(large )?language model\b',
+    r'\bi\'m (a |an )?(large )?language model\b',
+    r'\bas an? (ai|artificial intelligence|language model|llm)\b',
+)
+# One alternation so the answer is scanned once instead of once per pattern
+_SANITIZE_RE = re.compile("|".join(f"(?:{pattern})" for pattern in _SANITIZE_PATTERNS), re.IGNORECASE)
+_WS_RE = re.compile(r'\s+')
+_PAGE_RE = re.compile(r'\[PAGE \d+\]')
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Default answer prompt; AnswerGenerator(prompt_template=...) swaps in another
+# template with the same {history_section}, {context_text} and {query} fields
+CONTEXT_PROMPT_TEMPLATE = """You are "RAG Assistant", a document Q&A assistant.
 
 RULES:
 - Your name is "RAG Assistant" - never reveal the underlying AI model
@@ -74,12 +92,252 @@ DOCUMENT CONTEXT:
 USER QUESTION: {query}
 
 Provide a well-formatted answer with clear sections and bullet points:"""
-        return prompt
+
+# Smallest chunk excerpt worth adding when the context budget is nearly spent
+MIN_CONTEXT_FRAGMENT_CHARS = 200
+
+# Characters held back while streaming so sanitizer matches can span chunk boundaries
+STREAM_CARRY_CHARS = 64
+
+# Phrases that indicate a fallback/low-quality answer
+LOW_CONFIDENCE_PHRASES = ("insufficient information", "no relevant", "cannot find", "not found", "unable to")
+
+# Phrases that indicate the answer is NOT based on documents
+NO_CITATION_PHRASES = (
+    "does not contain", "no information", "cannot provide", "cannot find",
+    "not found in", "no relevant", "insufficient information", "unable to find",
+    "not mentioned", "i'm rag assistant", "please upload"
+)
+
+
+def _phrase_re(phrases) -> re.Pattern:
+    """Compile phrases into one case-insensitive alternation (no lowercased copy needed)."""
+    return re.compile("|".join(re.escape(phrase) for phrase in phrases), re.IGNORECASE)
+
+
+_LOW_CONF_RE = _phrase_re(LOW_CONFIDENCE_PHRASES)
+_NO_CITE_RE = _phrase_re(NO_CITATION_PHRASES)
+
+
+def _sanitize_fragment(text: str) -> str:
+    """Apply the answer sanitizer to part of a streamed answer (no trimming or fallback)."""
+    return _WS_RE.sub(' ', _SANITIZE_RE.sub('', text))
+
+
+def _stream_cut(buffer: str) -> int:
+    """
+    Index up to which a raw streamed buffer can be sanitized and emitted (0 if none).
+    
+    The cut is the last whitespace that keeps STREAM_CARRY_CHARS held back (longer
+    than any sanitizer match, so a match still being generated lies after it),
+    moved back to the start of any complete match that straddles it. The
+    unfinished last word is never scanned, since \b would match at its end.
+    """
+    stable = max(buffer.rfind(' '), buffer.rfind('\n'))
+    end = stable - STREAM_CARRY_CHARS
+    if end <= 0:
+        return 0
+    cut = max(buffer.rfind(' ', 0, end), buffer.rfind('\n', 0, end), 0)
+    for match in _SANITIZE_RE.finditer(buffer, 0, stable):
+        if match.start() >= cut:
+            break
+        if match.end() > cut:
+            return match.start()
+    return cut
+
+
+class AnswerGenerator:
+    """Generates answers using Google Gemini API."""
+    
+    def __init__(self, api_key: str = None, confidence_threshold: float = 0.2,
+                 request_timeout: float = 30.0, cache_size: int = 1024,
+                 cache_path: str = "./llm_cache.json", map_reduce_min_chunks: int = 6,
+                 max_concurrency: int = 4, prompt_template: str = CONTEXT_PROMPT_TEMPLATE,
+                 rate_limit_qpm: int = 500, max_context_chars: int = 8000,
+                 max_chunk_chars: int = 2000, max_context_tokens: int = 2000):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.confidence_threshold = confidence_threshold
+        # Upper bound on a single Gemini call, in seconds
+        self.request_timeout = request_timeout
+        # From this many chunks on, answer per chunk in parallel and merge (0 disables)
+        self.map_reduce_min_chunks = map_reduce_min_chunks
+        # Concurrent Gemini calls per query during map-reduce (keeps under QPM limits)
+        self.max_concurrency = max_concurrency
+        self.prompt_template = prompt_template
+        # Prompt length drives LLM latency: cap each chunk and the whole context block
+        self.max_context_chars = max_context_chars
+        self.max_chunk_chars = max_chunk_chars
+        # Token budget uses the token_count stored on chunk metadata at ingest (0 disables)
+        self.max_context_tokens = max_context_tokens
+        # Token bucket over all Gemini calls (needs aiolimiter; 0 disables)
+        self.rate_limiter = None
+        if rate_limit_qpm and AIOLIMITER_AVAILABLE:
+            self.rate_limiter = AsyncLimiter(rate_limit_qpm, 60)
+        # Repeated questions over the same chunks skip the LLM entirely
+        self.cache = ResponseCache(max_entries=cache_size, storage_path=cache_path)
+        self.model = None
+        
+        if self.api_key:
+            try:
+                self.model = get_model(self.api_key)
+                print("✓ Gemini LLM initialized successfully")
+            except Exception as e:
+                print(f"Warning: Could not initialize Gemini: {e}")
+                self.model = None
+        else:
+            print("Note: GEMINI_API_KEY not set. Using mock LLM.")
+    
+    def _build_context_prompt(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]], 
+                               conversation_history: str = "") -> str:
+        """Build prompt with document context."""
+        if retrieved_chunks:
+            # Write the context block straight into one buffer (no per-chunk list)
+            buf = io.StringIO()
+            for i, (text, metadata) in enumerate(self._pack_context(retrieved_chunks)):
+                if i:
+                    buf.write("\n\n---\n\n")
+                buf.write(self._chunk_header(metadata))
+                buf.write(text)
+            context_text = buf.getvalue()
+        else:
+            context_text = "No documents uploaded yet."
+        
+        history_section = ""
+        if conversation_history:
+            history_section = f"\nPREVIOUS CONVERSATION:\n{conversation_history}\n"
+        
+        return self.prompt_template.format(
+            history_section=history_section,
+            context_text=context_text,
+            query=query
+        )
+
+    def _trim_chunk(self, text: str, limit: int) -> str:
+        """Cut text to at most limit characters, preferring a sentence boundary."""
+        if len(text) <= limit:
+            return text
+        text = text[:limit]
+        boundary = None
+        for boundary in _SENT_SPLIT_RE.finditer(text):
+            pass
+        # Snap back only if that keeps most of the allowance
+        if boundary is not None and boundary.start() > limit // 2:
+            return text[:boundary.start()]
+        return text
+    
+    def _pack_context(self, retrieved_chunks: List[Tuple[str, dict, float]]) -> List[Tuple[str, dict]]:
+        """
+        Choose the chunk texts that go into the prompt.
+        
+        Chunks are admitted greedily by similarity until max_context_chars or
+        max_context_tokens is reached, each trimmed to max_chunk_chars, and
+        returned in their original (re-ranked) order. Token counts come from
+        chunk metadata (precomputed at ingest), so nothing is re-tokenized here.
+        
+        Args:
+            retrieved_chunks: List of (text, metadata, similarity) tuples
+            
+        Returns:
+            List of (text, metadata) pairs
+        """
+        budget = self.max_context_chars
+        token_budget = self.max_context_tokens or float("inf")
+        admitted = {}
+        for i in sorted(range(len(retrieved_chunks)), key=lambda i: retrieved_chunks[i][2], reverse=True):
+            # Leftover budget too small for a useful excerpt
+            if budget <= 0 or (admitted and budget < MIN_CONTEXT_FRAGMENT_CHARS):
+                break
+            original, metadata = self._clean_text(retrieved_chunks[i]), retrieved_chunks[i][1]
+            text = self._trim_chunk(original, min(self.max_chunk_chars, budget))
+            
+            # Scale the stored count by how much of the chunk survived trimming
+            tokens = metadata.get("token_count", len(original) // 4)
+            if original:
+                tokens = tokens * len(text) // len(original)
+            if admitted and tokens > token_budget:
+                continue
+            
+            admitted[i] = text
+            budget -= len(text)
+            token_budget -= tokens
+        return [(admitted[i], retrieved_chunks[i][1]) for i in sorted(admitted)]
+    
+    @staticmethod
+    def _clean_text(chunk: Tuple[str, dict, float]) -> str:
+        """Chunk text without page markers or runs of whitespace (precomputed at ingest)."""
+        clean = chunk[1].get('clean_text') if len(chunk) > 1 else None
+        if clean is None:
+            clean = _WS_RE.sub(' ', _PAGE_RE.sub('', str(chunk[0]))).strip()
+        return clean
+    
+    @staticmethod
+    def _chunk_header(metadata: dict) -> str:
+        """Source header for a chunk (precomputed at ingest; metadata is never modified)."""
+        header = metadata.get("_prompt_header")
+        if header is None:
+            header = f"[Document: {metadata['document_name']}, Page: {metadata['page_number']}]\n"
+        return header
+
+    def _chunk_prompt(self, query: str, chunk: Tuple[str, dict, float]) -> str:
+        """Build the map-step prompt: extract what one chunk says about the question."""
+        return f"""Extract the facts from this document excerpt that help answer the question.
+Reply with short bullet points only, or exactly NONE if the excerpt is not relevant.
+
+{self._chunk_header(chunk[1])}{self._trim_chunk(self._clean_text(chunk), self.max_chunk_chars)}
+
+QUESTION: {query}"""
+
+    async def _acquire_rate_limit(self) -> None:
+        """Wait for a rate-limiter slot before calling Gemini."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+
+    async def _generate_text(self, prompt: str) -> str:
+        """Run one Gemini call and return its text."""
+        await self._acquire_rate_limit()
+        response = await self.model.generate_content_async(
+            prompt, request_options={"timeout": self.request_timeout}
+        )
+        return response.text if response else ""
+
+    async def _map_reduce_answer(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]],
+                                 conversation_history: str = "") -> str:
+        """
+        Answer over many chunks with parallel per-chunk calls and one merge call.
+        
+        Args:
+            query: User question
+            retrieved_chunks: List of (text, metadata, similarity) tuples
+            conversation_history: Previous conversation context
+            
+        Returns:
+            Raw answer text from the reduce step
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def map_chunk(chunk):
+            async with semaphore:
+                return await self._generate_text(self._chunk_prompt(query, chunk))
+        
+        partials = await asyncio.gather(*[map_chunk(chunk) for chunk in retrieved_chunks])
+        
+        # Reduce over the extracted notes, keeping each chunk's document/page header
+        # The note replaces the chunk's cleaned text in the reduce prompt; the chunk's
+        # token_count is dropped so _pack_context budgets the (much shorter) note itself
+        notes = [
+            (partial.strip(),
+             {**{key: value for key, value in chunk[1].items() if key != 'token_count'},
+              'clean_text': partial.strip()},
+             chunk[2])
+            for partial, chunk in zip(partials, retrieved_chunks)
+            if partial.strip() and partial.strip().upper() != "NONE"
+        ]
+        reduce_prompt = self._build_context_prompt(query, notes or retrieved_chunks, conversation_history)
+        return await self._generate_text(reduce_prompt)
 
     def _calculate_confidence(self, query: str, answer: str, retrieved_chunks: List[Tuple[str, dict, float]]) -> float:
         """Calculate confidence score."""
-        low_confidence_phrases = ["insufficient information", "no relevant", "cannot find", "not found", "unable to"]
-        if any(phrase in answer.lower() for phrase in low_confidence_phrases):
+        if _LOW_CONF_RE.search(answer):
             return 0.4
         
         base = 0.7 if retrieved_chunks else 0.3
@@ -90,45 +348,31 @@ Provide a well-formatted answer with clear sections and bullet points:"""
         return min(0.95, max(0.3, base + length_boost + source_boost))
     
     def _extract_citations(self, retrieved_chunks: List[Tuple[str, dict, float]]) -> List[Citation]:
-        """Extract citations from chunks."""
+        """Extract citations from chunks (one per document page)."""
         citations = []
         seen = set()
+        seen_add = seen.add
         for chunk in retrieved_chunks:
             metadata = chunk[1]
-            key = (metadata['document_name'], metadata['page_number'])
+            key = metadata.get('_cite_key') or (metadata['document_name'], metadata['page_number'])
             if key not in seen:
-                citations.append(Citation(
+                seen_add(key)
+                # Fields come from our own chunk metadata, so skip pydantic validation
+                citations.append(Citation.model_construct(
                     document=metadata['document_name'],
                     page=metadata['page_number'],
                     chunk_id=metadata['chunk_id']
                 ))
-                seen.add(key)
         return citations
     
     def _should_show_citations(self, answer: str) -> bool:
         """Check if citations should be shown."""
-        no_citation_phrases = [
-            "does not contain", "no information", "cannot provide", "cannot find",
-            "not found in", "no relevant", "insufficient information", "unable to find",
-            "not mentioned", "i'm rag assistant", "please upload"
-        ]
-        return not any(phrase in answer.lower() for phrase in no_citation_phrases)
+        return _NO_CITE_RE.search(answer) is None
     
     def _sanitize_answer(self, answer: str) -> str:
         """Remove sensitive information from answer."""
-        patterns = [
-            r'\b(trained by|developed by|created by|built by|made by)\s*(google|openai|anthropic|meta|microsoft)\b',
-            r'\b(gemini|gpt-?\d*|claude|llama|palm|bard)\b',
-            r'\bi am (a |an )?(large )?language model\b',
-            r'\bi\'m (a |an )?(large )?language model\b',
-            r'\bas an? (ai|artificial intelligence|language model|llm)\b',
-        ]
-        
-        sanitized = answer
-        for pattern in patterns:
-            sanitized = re.sub(pattern, '', sanitized, flags=re.IGNORECASE)
-        
-        sanitized = re.sub(r'\s+', ' ', sanitized).strip()
+        sanitized = _SANITIZE_RE.sub('', answer)
+        sanitized = _WS_RE.sub(' ', sanitized).strip()
         if len(sanitized) < 20:
             sanitized = "I'm RAG Assistant. Please ask me questions about your uploaded documents."
         
@@ -137,18 +381,34 @@ Provide a well-formatted answer with clear sections and bullet points:"""
 
     def generate_answer(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]],
                         conversation_history: str = "") -> Dict:
-        """Generate answer with citations and confidence."""
+        """Generate answer with citations and confidence (blocking wrapper for CLI use)."""
+        return asyncio.run(self.agenerate_answer(query, retrieved_chunks, conversation_history))
+    
+    async def agenerate_answer(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]],
+                               conversation_history: str = "") -> Dict:
+        """Generate answer with citations and confidence without blocking the event loop."""
+        cache_key = ResponseCache.make_key(
+            query, [chunk[1]['chunk_id'] for chunk in retrieved_chunks], conversation_history
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            cached["citations"] = [Citation.model_construct(**citation) for citation in cached["citations"]]
+            return cached
+        
         answer = None
-        citations = []
-        confidence = 0.0
+        # Only real model output is cached; mock, rate-limit and error fallbacks are not
+        cacheable = False
         
         try:
-            prompt = self._build_context_prompt(query, retrieved_chunks, conversation_history)
-            
             try:
-                if self.model:
-                    response = self.model.generate_content(prompt)
-                    answer = response.text if response else "Unable to generate answer"
+                if self.model and self.map_reduce_min_chunks and len(retrieved_chunks) >= self.map_reduce_min_chunks:
+                    answer = await self._map_reduce_answer(query, retrieved_chunks, conversation_history)
+                    cacheable = bool(answer)
+                elif self.model:
+                    prompt = self._build_context_prompt(query, retrieved_chunks, conversation_history)
+                    answer = await self._generate_text(prompt)
+                    cacheable = bool(answer)
+                    answer = answer or "Unable to generate answer"
                 else:
                     answer = self._mock_generate_answer(query, retrieved_chunks)
             except Exception as e:
@@ -158,21 +418,116 @@ Provide a well-formatted answer with clear sections and bullet points:"""
                 else:
                     answer = f"Error generating answer: {str(e)}"
             
-            if answer:
-                answer = self._sanitize_answer(answer)
-                confidence = self._calculate_confidence(query, answer, retrieved_chunks)
-            
-            if self._should_show_citations(answer):
-                citations = self._extract_citations(retrieved_chunks)
-            else:
-                confidence = min(confidence, 0.5)
-            
-            if len(retrieved_chunks) == 0 and confidence < self.confidence_threshold:
-                answer = "Please upload a document first, then ask questions about its content."
+            result = self._finalize_answer(query, answer, retrieved_chunks)
         
         except Exception as e:
-            answer = f"Error processing query: {str(e)}"
-            confidence = 0.0
+            result = {
+                "answer": f"Error processing query: {str(e)}",
+                "citations": [],
+                "confidence": 0.0,
+                "retrieved_chunks": len(retrieved_chunks)
+            }
+            cacheable = False
+        
+        if cacheable:
+            self._cache_result(cache_key, result)
+        return result
+    
+    async def astream_answer(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]],
+                             conversation_history: str = ""):
+        """
+        Stream a sanitized answer while Gemini is still generating it.
+        
+        Args:
+            query: User question
+            retrieved_chunks: List of (text, metadata, similarity) tuples
+            conversation_history: Previous conversation context
+            
+        Yields:
+            {"type": "token", "text": ...} events as text becomes available, then one
+            {"type": "final", ...} event with the complete answer, citations and confidence
+        """
+        cache_key = ResponseCache.make_key(
+            query, [chunk[1]['chunk_id'] for chunk in retrieved_chunks], conversation_history
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            cached["citations"] = [Citation.model_construct(**citation) for citation in cached["citations"]]
+            yield {"type": "token", "text": cached["answer"]}
+            yield {"type": "final", **cached}
+            return
+        
+        raw_parts = []
+        buffer = ""
+        # True at the start and after emitted whitespace, so collapsed spaces never double up
+        at_space = True
+        # Only a completed model stream is cached; fallbacks are not
+        cacheable = False
+        
+        if self.model:
+            try:
+                prompt = self._build_context_prompt(query, retrieved_chunks, conversation_history)
+                await self._acquire_rate_limit()
+                response = await self.model.generate_content_async(
+                    prompt, stream=True, request_options={"timeout": self.request_timeout}
+                )
+                cacheable = True
+                async for chunk in response:
+                    raw_parts.append(chunk.text)
+                    # The buffer stays raw; only the settled prefix is sanitized and emitted
+                    buffer += chunk.text
+                    cut = _stream_cut(buffer)
+                    if cut:
+                        text = _sanitize_fragment(buffer[:cut])
+                        buffer = buffer[cut:]
+                        if at_space:
+                            text = text.lstrip()
+                        if text:
+                            at_space = text[-1].isspace()
+                            yield {"type": "token", "text": text}
+            except Exception as e:
+                cacheable = False
+                if raw_parts:
+                    print(f"Warning: Answer stream interrupted: {e}")
+                elif "429" in str(e) or "quota" in str(e).lower():
+                    print("Rate limit hit, using mock LLM fallback")
+                    buffer = self._mock_generate_answer(query, retrieved_chunks)
+                    raw_parts = [buffer]
+                else:
+                    buffer = f"Error generating answer: {str(e)}"
+                    raw_parts = [buffer]
+        else:
+            buffer = self._mock_generate_answer(query, retrieved_chunks)
+            raw_parts = [buffer]
+        
+        text = _sanitize_fragment(buffer).rstrip()
+        if at_space:
+            text = text.lstrip()
+        if text:
+            yield {"type": "token", "text": text}
+        
+        # The final event carries the authoritative answer (fallback messages included)
+        result = self._finalize_answer(query, "".join(raw_parts), retrieved_chunks)
+        if cacheable and raw_parts:
+            self._cache_result(cache_key, result)
+        yield {"type": "final", **result}
+    
+    def _finalize_answer(self, query: str, answer: str, retrieved_chunks: List[Tuple[str, dict, float]]) -> Dict:
+        """Sanitize a raw answer and attach confidence and citations."""
+        confidence = 0.0
+        if answer:
+            answer = self._sanitize_answer(answer)
+            confidence = self._calculate_confidence(query, answer, retrieved_chunks)
+        
+        # Citations are only built when they will be shown
+        if self._should_show_citations(answer or ""):
+            citations = self._extract_citations(retrieved_chunks)
+        else:
+            citations = []
+            confidence = min(confidence, 0.5)
+        
+        if len(retrieved_chunks) == 0 and confidence < self.confidence_threshold:
+            answer = "Please upload a document first, then ask questions about its content."
         
         return {
             "answer": answer or "Unable to generate answer",
@@ -181,6 +536,13 @@ Provide a well-formatted answer with clear sections and bullet points:"""
             "retrieved_chunks": len(retrieved_chunks)
         }
     
+    def _cache_result(self, cache_key: str, result: Dict) -> None:
+        """Store a result with its citations in JSON-serializable form."""
+        self.cache.put(cache_key, {
+            **result,
+            "citations": [citation.model_dump() for citation in result["citations"]]
+        })
+    
     def _mock_generate_answer(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]]) -> str:
         """Generate formatted answer without LLM (fallback)."""
         if not retrieved_chunks:
@@ -190,34 +552,25 @@ Provide a well-formatted answer with clear sections and bullet points:"""
             sections = []
             for chunk_item in retrieved_chunks[:4]:
                 if chunk_item and len(chunk_item) > 0:
-                    text = str(chunk_item[0]).strip()
-                    text = re.sub(r'\[PAGE \d+\]', '', text)
-                    text = re.sub(r'\s+', ' ', text).strip()
+                    text = self._clean_text(chunk_item)
                     if text and len(text) > 50:
                         sections.append(text)
             
             if not sections:
                 return "No relevant information found in the documents."
             
-            # Build formatted response with proper line breaks
-            response_parts = []
-            response_parts.append("**Document Overview**")
-            response_parts.append("")
-            response_parts.append("Based on the uploaded document, here are the key points:")
-            response_parts.append("")
-            response_parts.append("**Key Information**")
-            response_parts.append("")
-            
-            for i, text in enumerate(sections):
-                # Extract meaningful sentences
-                sentences = re.split(r'(?<=[.!?])\s+', text)
-                for sentence in sentences[:2]:  # Take first 2 sentences per chunk
-                    sentence = sentence.strip()
-                    if len(sentence) > 30 and len(sentence) < 300:
-                        response_parts.append(f"• {sentence}")
-                        response_parts.append("")  # Empty line after each bullet
-            
-            return "\n".join(response_parts)
+            # Take up to the first 2 meaningful sentences per chunk
+            bullets = "\n\n".join(
+                f"• {sentence}"
+                for text in sections
+                for sentence in map(str.strip, _SENT_SPLIT_RE.split(text)[:2])
+                if 30 < len(sentence) < 300
+            )
+            return (
+                "**Document Overview**\n\n"
+                "Based on the uploaded document, here are the key points:\n\n"
+                f"**Key Information**\n\n{bullets}\n"
+            )
             
         except Exception as e:
             return f"Error processing documents: {str(e)}"
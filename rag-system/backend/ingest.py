@@ -9,6 +9,24 @@ from typing import List, Tuple
 from PyPDF2 import PdfReader
 import re
 
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+if TIKTOKEN_AVAILABLE:
+    try:
+        # Loaded once; encoding setup is far more expensive than encoding a chunk
+        _ENCODING = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # The BPE file is downloaded on first use; offline hosts use estimate_tokens
+        print(f"Warning: Could not load tiktoken encoding, estimating token counts: {e}")
+        TIKTOKEN_AVAILABLE = False
+
+_PAGE_MARKER_RE = re.compile(r'\[PAGE \d+\]')
+_WS_RE = re.compile(r'\s+')
+
 
 class DocumentChunk:
     """Represents a single chunk of a document."""
@@ -23,10 +41,21 @@ class DocumentChunk:
             "document_name": document_name,
             "page_number": page_number,
             "chunk_id": chunk_id,
-            "token_count": token_count
+            "token_count": token_count,
+            # Text as sent to the LLM, cleaned once here rather than per query
+            "clean_text": clean_chunk_text(text),
+            # Citation dedupe key, built once instead of per query
+            "_cite_key": (document_name, page_number),
+            # Source header for the LLM prompt (format matches AnswerGenerator._chunk_header)
+            "_prompt_header": f"[Document: {document_name}, Page: {page_number}]\n"
         }
 
 
+def clean_chunk_text(text: str) -> str:
+    """Strip page markers and collapse whitespace in chunk text."""
+    return _WS_RE.sub(' ', _PAGE_MARKER_RE.sub('', text)).strip()
+
+
 def estimate_tokens(text: str) -> int:
     """
     Estimate token count using simple word-based heuristic.
@@ -36,6 +65,22 @@ def estimate_tokens(text: str) -> int:
     return max(1, int(words / 1.3))
 
 
+def count_tokens(texts: List[str]) -> List[int]:
+    """
+    Count tokens for a batch of texts.
+    Uses the cl100k_base tokenizer when tiktoken is installed, else estimate_tokens.
+    
+    Args:
+        texts: Texts to count
+        
+    Returns:
+        Token count per text
+    """
+    if TIKTOKEN_AVAILABLE:
+        return [len(tokens) for tokens in _ENCODING.encode_ordinary_batch(texts)]
+    return [estimate_tokens(text) for text in texts]
+
+
 def extract_text_from_pdf(file_path: str) -> Tuple[str, int]:
     """
     Extract text from PDF file with page tracking.
@@ -48,14 +93,14 @@ def extract_text_from_pdf(file_path: str) -> Tuple[str, int]:
     """
     try:
         reader = PdfReader(file_path)
-        full_text = ""
+        parts = []
         
         for page_num, page in enumerate(reader.pages):
             text = page.extract_text()
             # Add page marker for tracking
-            full_text += f"\n[PAGE {page_num + 1}]\n{text}\n"
+            parts.append(f"\n[PAGE {page_num + 1}]\n{text}\n")
         
-        return full_text, len(reader.pages)
+        return "".join(parts), len(reader.pages)
     except Exception as e:
         raise ValueError(f"Failed to extract PDF: {str(e)}")
 
@@ -134,11 +179,13 @@ def ingest_document(file_path: str, document_name: str, chunk_size: int = 400, o
     # Split into chunks using chunk_text function
     text_chunks = chunk_text(full_text, chunk_size, overlap)
     
+    # Token counts are computed once here and reused for prompt packing
+    token_counts = count_tokens(text_chunks)
+    
     # Create DocumentChunk objects with metadata
     document_chunks = []
-    for idx, text_content in enumerate(text_chunks):
+    for idx, (text_content, token_count) in enumerate(zip(text_chunks, token_counts)):
         page_num = extract_page_number(text_content)
-        token_count = estimate_tokens(text_content)
         
         chunk = DocumentChunk(
             chunk_id=f"{document_name}_{idx}",
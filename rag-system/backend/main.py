@@ -5,11 +5,12 @@ Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
 import os
+import json
 import tempfile
 from datetime import datetime
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 
 # Load environment variables from .env file
@@ -89,6 +90,14 @@ else:
     print("⚠️  Running in demo mode - dependencies not available")
 
 
+@app.on_event("shutdown")
+def save_response_cache():
+    """Persist cached LLM responses and pending conversation memory so they survive restarts."""
+    if agent:
+        agent.generator.cache.save()
+        agent.memory.flush()
+
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """
@@ -181,7 +190,7 @@ async def chat(request: ChatRequest):
     try:
         if agent:
             # Process query through RAG pipeline with memory
-            response = agent.process_query(
+            response = await agent.process_query_async(
                 request.query, 
                 conversation_id=request.conversation_id
             )
@@ -202,6 +211,45 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
 
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Stream a RAG-based answer as newline-delimited JSON.
+    Emits {"type": "token", "text": ...} events while the answer is generated,
+    then one {"type": "final", ...} event with the full answer, citations and confidence.
+    
+    Args:
+        request: ChatRequest with user query and optional conversation_id
+        
+    Returns:
+        StreamingResponse of NDJSON events
+    """
+    if not request.query or len(request.query.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    async def events():
+        if not agent:
+            # Demo mode - single simulated event
+            yield json.dumps({
+                "type": "final",
+                "answer": f"Demo Response: This is a simulated answer to your query: '{request.query}'.",
+                "citations": [],
+                "confidence": 0.85,
+                "retrieved_chunks": 0
+            }) + "\n"
+            return
+        try:
+            async for event in agent.process_query_stream(request.query, conversation_id=request.conversation_id):
+                if event["type"] == "final":
+                    event = {**event, "citations": [citation.model_dump() for citation in event["citations"]]}
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            yield json.dumps({"type": "error", "detail": f"Query processing failed: {str(e)}"}) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -212,7 +260,8 @@ async def root():
         "endpoints": {
             "health": "GET /health",
             "upload": "POST /upload",
-            "chat": "POST /chat"
+            "chat": "POST /chat",
+            "chat_stream": "POST /chat/stream"
         },
         "docs": "/docs"
     }
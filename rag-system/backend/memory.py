@@ -5,64 +5,252 @@ Implements short-term and long-term memory for chat context.
 
 import json
 import os
+import zlib
+import atexit
+import asyncio
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional
-from collections import deque
+from typing import List, Dict, Optional, Tuple
+from collections import deque, defaultdict
+from itertools import islice
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _dumps(record: Dict) -> bytes:
+    """Serialize one log record to bytes."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(record, default=str)
+    return json.dumps(record, default=str).encode("utf-8")
+
+
+def _loads(line: bytes) -> Dict:
+    """Parse one log record."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class _MemoryShard:
+    """
+    One partition of conversation memory with its own JSONL log and locks.
+    Log lines are {"cid", "msg"} records or {"cid", "clear": true} markers.
+    """
+    
+    def __init__(self, log_path: str, max_short_term: int, max_long_term: int):
+        self.log_path = log_path
+        self.max_short_term = max_short_term
+        self.max_long_term = max_long_term
+        self.short_term: Dict[str, deque] = {}
+        self.long_term: Dict[str, deque] = {}
+        
+        # Orders writers on the event loop; file_lock guards the file handle across threads
+        self.lock = asyncio.Lock()
+        self.file_lock = threading.Lock()
+        
+        # Log lines that no longer back a live message (trimmed or cleared)
+        self.dropped = 0
+        self.lines = 0
+        self.skipped = 0
+        self.log_fh = None
+        
+        # Only logs this instance appended to are compacted on flush()
+        self.written = False
+    
+    def _replay(self) -> Tuple[Dict[str, deque], int, int]:
+        """
+        Read the shard log from disk.
+        
+        Returns:
+            Tuple of (live messages per conversation, log lines, unreadable lines)
+        """
+        long_term: Dict[str, deque] = {}
+        lines = skipped = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = _loads(line)
+                    except ValueError:
+                        # Torn final line from an interrupted write
+                        skipped += 1
+                        continue
+                    
+                    cid = record["cid"]
+                    if record.get("clear"):
+                        long_term.pop(cid, None)
+                        continue
+                    if cid not in long_term:
+                        long_term[cid] = deque(maxlen=self.max_long_term)
+                    long_term[cid].append(record["msg"])
+        return long_term, lines, skipped
+    
+    def load(self) -> None:
+        """Replay the shard log into long-term memory."""
+        self.long_term, self.lines, self.skipped = self._replay()
+        self.dropped = self.lines - self.message_count()
+        self.log_fh = open(self.log_path, "ab", buffering=0)
+    
+    def message_count(self) -> int:
+        return sum(len(v) for v in self.long_term.values())
+    
+    def append(self, record: bytes) -> None:
+        """Append one serialized record, compacting once the log is mostly dead lines."""
+        with self.file_lock:
+            try:
+                self.log_fh.write(record + b"\n")
+                self.lines += 1
+                self.written = True
+                if self.dropped > max(self.lines // 2, self.max_long_term):
+                    self.compact()
+            except Exception as e:
+                print(f"Warning: Could not save memory: {e}")
+    
+    def compact(self) -> None:
+        """
+        Atomically rewrite the log with one line per live message (caller holds file_lock).
+        The live set is replayed from the log itself, not this instance's memory,
+        so records appended by another instance over the same file are kept.
+        """
+        if self.log_fh is not None:
+            self.log_fh.close()
+        try:
+            long_term, _, _ = self._replay()
+            tmp_path = self.log_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                for cid, messages in long_term.items():
+                    for message in messages:
+                        f.write(_dumps({"cid": cid, "msg": message}) + b"\n")
+            os.replace(tmp_path, self.log_path)
+            self.lines = sum(len(v) for v in long_term.values())
+            self.dropped = 0
+        finally:
+            self.log_fh = open(self.log_path, "ab", buffering=0)
 
 
 class ConversationMemory:
     """
     Manages conversation history with short-term and long-term memory.
     - Short-term: Recent messages in current session (kept in memory)
-    - Long-term: Persisted to disk for retrieval across sessions
+    - Long-term: Appended to JSONL logs on disk for retrieval across sessions
+    
+    State is split into shards by conversation id, each with its own lock and
+    log file, so concurrent conversations do not serialize on one lock or file.
     """
     
-    def __init__(self, 
+    def __init__(self,
                  max_short_term: int = 10,
                  max_long_term: int = 100,
-                 storage_path: str = "./conversation_history.json"):
+                 storage_path: str = "./conversation_history.json",
+                 num_shards: int = 16):
         """
         Initialize memory system.
         
         Args:
             max_short_term: Max messages to keep in short-term memory
             max_long_term: Max messages to persist in long-term storage
-            storage_path: Path to JSON file for long-term storage
+            storage_path: Long-term storage path; shard logs are written next to it
+                as <name>.<shard>.jsonl (older single-file histories are migrated)
+            num_shards: Number of independent memory partitions
         """
         self.max_short_term = max_short_term
         self.max_long_term = max_long_term
         self.storage_path = storage_path
+        self.num_shards = num_shards
         
-        # Short-term memory (current session)
-        self.short_term: Dict[str, deque] = {}
+        base = os.path.splitext(storage_path)[0]
+        self._shards = [
+            _MemoryShard(f"{base}.{i}.jsonl", max_short_term, max_long_term)
+            for i in range(num_shards)
+        ]
+        
+        # Prompt summaries keyed by conversation, valid while the version matches
+        self._version: Dict[str, int] = defaultdict(int)
+        self._summary_cache: Dict[str, Tuple[int, str]] = {}
         
         # Load long-term memory from disk
-        self.long_term: Dict[str, List[Dict]] = self._load_long_term()
+        self._load_long_term()
+        
+        # Compact the logs on interpreter exit
+        atexit.register(self.flush)
         
         print(f"✓ Memory initialized (short-term: {max_short_term}, long-term: {max_long_term})")
     
-    def _load_long_term(self) -> Dict[str, List[Dict]]:
+    def _shard(self, conversation_id: str) -> _MemoryShard:
+        """Shard owning a conversation (stable across processes, unlike hash())."""
+        return self._shards[zlib.crc32(conversation_id.encode("utf-8")) % self.num_shards]
+    
+    def _load_long_term(self):
         """Load long-term memory from disk."""
-        if os.path.exists(self.storage_path):
-            try:
-                with open(self.storage_path, 'r') as f:
-                    data = json.load(f)
-                    print(f"✓ Loaded {sum(len(v) for v in data.values())} messages from long-term memory")
-                    return data
-            except Exception as e:
-                print(f"Warning: Could not load memory: {e}")
-        return {}
+        legacy = None
+        if not any(os.path.exists(shard.log_path) for shard in self._shards):
+            legacy = self._load_legacy()
+        
+        try:
+            for shard in self._shards:
+                shard.load()
+        except Exception as e:
+            print(f"Warning: Could not load memory: {e}")
+        
+        if legacy:
+            # Distribute the migrated history into shard logs
+            for cid, messages in legacy.items():
+                shard = self._shard(cid)
+                shard.long_term[cid] = deque(messages[-self.max_long_term:], maxlen=self.max_long_term)
+                for message in shard.long_term[cid]:
+                    shard.append(_dumps({"cid": cid, "msg": message}))
+        
+        skipped = sum(shard.skipped for shard in self._shards)
+        if skipped:
+            print(f"Warning: Skipped {skipped} unreadable memory log lines")
+        total = sum(shard.message_count() for shard in self._shards)
+        if total:
+            print(f"✓ Loaded {total} messages from long-term memory")
     
-    def _save_long_term(self):
-        """Save long-term memory to disk."""
+    def _load_legacy(self) -> Dict[str, List[Dict]]:
+        """Read a single-file history (JSONL log or whole-file JSON) if one exists."""
+        log_path = os.path.splitext(self.storage_path)[0] + ".jsonl"
+        data: Dict[str, List[Dict]] = {}
         try:
-            with open(self.storage_path, 'w') as f:
-                json.dump(self.long_term, f, indent=2, default=str)
+            if os.path.exists(log_path):
+                with open(log_path, "rb") as f:
+                    for line in f:
+                        try:
+                            record = _loads(line)
+                        except ValueError:
+                            continue
+                        if record.get("clear"):
+                            data.pop(record["cid"], None)
+                        else:
+                            data.setdefault(record["cid"], []).append(record["msg"])
+            elif os.path.exists(self.storage_path):
+                with open(self.storage_path, 'r') as f:
+                    data = json.load(f)
         except Exception as e:
-            print(f"Warning: Could not save memory: {e}")
+            print(f"Warning: Could not load memory: {e}")
+            return {}
+        if data:
+            print(f"✓ Migrating {sum(len(v) for v in data.values())} messages to sharded memory logs")
+        return data
+    
+    def flush(self):
+        """Compact the shard logs this instance wrote to that hold dropped messages."""
+        for shard in self._shards:
+            with shard.file_lock:
+                if not shard.dropped or not shard.written:
+                    continue
+                try:
+                    shard.compact()
+                except Exception as e:
+                    print(f"Warning: Could not compact memory: {e}")
     
-    def add_message(self, conversation_id: str, role: str, content: str, 
-                    metadata: Optional[Dict] = None):
+    async def add_message(self, conversation_id: str, role: str, content: str,
+                          metadata: Optional[Dict] = None):
         """
         Add a message to memory.
         
@@ -78,23 +266,26 @@ class ConversationMemory:
             "timestamp": datetime.now().isoformat(),
             "metadata": metadata or {}
         }
+        shard = self._shard(conversation_id)
         
-        # Add to short-term memory
-        if conversation_id not in self.short_term:
-            self.short_term[conversation_id] = deque(maxlen=self.max_short_term)
-        self.short_term[conversation_id].append(message)
-        
-        # Add to long-term memory
-        if conversation_id not in self.long_term:
-            self.long_term[conversation_id] = []
-        self.long_term[conversation_id].append(message)
-        
-        # Trim long-term memory if needed
-        if len(self.long_term[conversation_id]) > self.max_long_term:
-            self.long_term[conversation_id] = self.long_term[conversation_id][-self.max_long_term:]
-        
-        # Persist to disk
-        self._save_long_term()
+        async with shard.lock:
+            # Add to short-term memory
+            if conversation_id not in shard.short_term:
+                shard.short_term[conversation_id] = deque(maxlen=self.max_short_term)
+            shard.short_term[conversation_id].append(message)
+            self._version[conversation_id] += 1
+            
+            # Add to long-term memory (a full deque evicts its oldest message)
+            if conversation_id not in shard.long_term:
+                shard.long_term[conversation_id] = deque(maxlen=self.max_long_term)
+            history = shard.long_term[conversation_id]
+            if len(history) == self.max_long_term:
+                shard.dropped += 1
+            history.append(message)
+            
+            # Persist to disk (one appended line) without blocking the event loop
+            record = _dumps({"cid": conversation_id, "msg": message})
+            await asyncio.get_running_loop().run_in_executor(None, shard.append, record)
     
     def get_context(self, conversation_id: str, max_messages: int = 6) -> List[Dict]:
         """
@@ -103,18 +294,21 @@ class ConversationMemory:
         Args:
             conversation_id: Conversation identifier
             max_messages: Maximum messages to return
-            
+        
         Returns:
             List of recent messages
         """
+        shard = self._shard(conversation_id)
+        
         # First check short-term memory
-        if conversation_id in self.short_term:
-            messages = list(self.short_term[conversation_id])
+        if conversation_id in shard.short_term:
+            messages = list(shard.short_term[conversation_id])
             return messages[-max_messages:]
         
         # Fall back to long-term memory
-        if conversation_id in self.long_term:
-            return self.long_term[conversation_id][-max_messages:]
+        if conversation_id in shard.long_term:
+            history = shard.long_term[conversation_id]
+            return list(islice(history, max(0, len(history) - max_messages), None))
         
         return []
     
@@ -124,10 +318,15 @@ class ConversationMemory:
         
         Args:
             conversation_id: Conversation identifier
-            
+        
         Returns:
             Summary string
         """
+        version = self._version[conversation_id]
+        cached = self._summary_cache.get(conversation_id)
+        if cached and cached[0] == version:
+            return cached[1]
+        
         messages = self.get_context(conversation_id, max_messages=10)
         if not messages:
             return ""
@@ -138,21 +337,27 @@ class ConversationMemory:
             content = msg["content"][:200] + "..." if len(msg["content"]) > 200 else msg["content"]
             summary_parts.append(f"{role}: {content}")
         
-        return "\n".join(summary_parts)
+        summary = "\n".join(summary_parts)
+        self._summary_cache[conversation_id] = (version, summary)
+        return summary
     
-    def clear_conversation(self, conversation_id: str):
+    async def clear_conversation(self, conversation_id: str):
         """Clear a specific conversation from memory."""
-        if conversation_id in self.short_term:
-            del self.short_term[conversation_id]
-        if conversation_id in self.long_term:
-            del self.long_term[conversation_id]
-            self._save_long_term()
+        shard = self._shard(conversation_id)
+        async with shard.lock:
+            shard.short_term.pop(conversation_id, None)
+            self._version[conversation_id] += 1
+            if conversation_id in shard.long_term:
+                # Dropped messages plus the clear marker itself are dead once compacted
+                shard.dropped += len(shard.long_term.pop(conversation_id)) + 1
+                record = _dumps({"cid": conversation_id, "clear": True})
+                await asyncio.get_running_loop().run_in_executor(None, shard.append, record)
     
     def get_all_conversations(self) -> List[str]:
         """Get list of all conversation IDs."""
-        all_ids = set(self.short_term.keys()) | set(self.long_term.keys())
+        all_ids = set()
+        for shard in self._shards:
+            all_ids.update(shard.short_term.keys())
+            all_ids.update(shard.long_term.keys())
         return list(all_ids)
 
-
-# Global memory instance
-memory = ConversationMemory()
@@ -4,10 +4,61 @@ Uses TF-IDF for fast, lightweight text similarity (no heavy ML models).
 Domain: Academic & Research Documents (AI & ML PDFs)
 """
 
-from typing import List, Tuple
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from joblib import Parallel, cpu_count, delayed
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+from mmr_kernel import mmr_select
+from spmv_kernel import csr_matvec
+
+try:
+    import re2
+    RE2_AVAILABLE = True
+except ImportError:
+    RE2_AVAILABLE = False
+
+# Runs of 2+ word characters: sklearn's default (?u)\b\w\w+\b in RE2 syntax
+# (RE2's \w and \b are ASCII-only, so spell out the Unicode classes)
+TOKEN_PATTERN = r"[\p{L}\p{N}_]{2,}"
+
+# Hashed feature space for unigrams + bigrams (fixed, so adding chunks never refits)
+HASH_FEATURES = 2 ** 18
+
+# New rows (as a fraction of the rows weighted with the current IDF) tolerated
+# before every chunk is re-weighted; until then new rows use the existing IDF
+IDF_REFRESH_FRACTION = 0.1
+
+# Largest dense copy of the chunk vectors (rows x corpus terms, float32) kept for BLAS scoring
+DENSE_MAX_BYTES = 64 * 2 ** 20
+
+# Use CSC column access when the query's columns hold less than this share of all nonzeros
+CSC_MAX_NNZ_FRACTION = 0.25
+
+# Batches at least this large are hashed in parallel worker processes
+PARALLEL_HASH_MIN_TEXTS = 2000
+
+# Queries whose hashed term vectors are memoized (interactive queries repeat)
+QUERY_CACHE_SIZE = 1024
+
+# MMR re-ranks up to top_k * MMR_CANDIDATE_FACTOR search hits, capped at MMR_MAX_CANDIDATES
+MMR_CANDIDATE_FACTOR = 3
+MMR_MAX_CANDIDATES = 64
+
+# (query, retrieved rows) pairs whose MMR similarity matrices are memoized
+MMR_CACHE_SIZE = 256
+
+
+if RE2_AVAILABLE:
+    _TOKEN_RE = re2.compile(TOKEN_PATTERN)
+    
+    def _re2_tokenize(text: str) -> List[str]:
+        """Split lowercased text into tokens with a linear-time RE2 DFA."""
+        return _TOKEN_RE.findall(text)
 
 
 class VectorRetriever:
@@ -18,38 +69,159 @@ class VectorRetriever:
     
     def __init__(self, db_path: str = "./chroma_db", embedding_model: str = "tfidf"):
         """
-        Initialize retriever with TF-IDF vectorizer.
+        Initialize retriever with a hashing TF-IDF vectorizer.
         
         Args:
             db_path: Not used (kept for API compatibility)
             embedding_model: Not used (kept for API compatibility)
         """
-        self.vectorizer = TfidfVectorizer(
-            max_features=5000,
+        # Stateless: term counts only; IDF is maintained incrementally below
+        self.vectorizer = HashingVectorizer(
+            n_features=HASH_FEATURES,
             stop_words=None,  # Don't remove stop words - helps with general queries
             ngram_range=(1, 2),
-            min_df=1,
-            sublinear_tf=True
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32,  # Half the bytes per nonzero for the bandwidth-bound SpMV
+            # Tokenize with RE2 when installed (module-level, so it pickles for joblib)
+            tokenizer=_re2_tokenize if RE2_AVAILABLE else None,
+            token_pattern=None if RE2_AVAILABLE else r"(?u)\b\w\w+\b"
         )
-        self.chunks = []  # Store chunks in memory
-        self.chunk_vectors = None
-        self.is_fitted = False
+        # Hashing is corpus-independent, so cached query rows never go stale
+        self._query_term_frequencies = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._term_frequency_row)
+        self._mmr_similarities = lru_cache(maxsize=MMR_CACHE_SIZE)(self._compute_mmr_similarities)
+        # Serializes index updates; searches run concurrently on the executor
+        self._index_lock = threading.Lock()
+        self._reset_index()
         print("✓ Vector store ready")
     
-    def clear_collection(self) -> None:
-        """Clear all documents from the collection."""
-        self.chunks = []
-        self.chunk_vectors = None
+    def _reset_index(self) -> None:
+        """Drop all stored chunks and vectors."""
+        # Chunks in memory as parallel per-row columns
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._chunk_ids: List[str] = []
+        self._rows: Dict[str, int] = {}  # chunk_id -> row in tf_vectors / chunk_vectors
+        self.tf_vectors = None  # Sublinear term frequencies, one row per chunk
+        if getattr(self, 'doc_freq', None) is None:
+            self.doc_freq = np.zeros(HASH_FEATURES, dtype=np.int32)
+        else:
+            self.doc_freq.fill(0)  # Reuse the buffer across clears
+        self.idf = None
+        self.idf_rows = 0  # Chunks counted in the current IDF
+        self.chunk_vectors = None  # TF-IDF weighted + L2-normalized, built lazily
+        # Snapshot (chunk_vectors, dense_vectors, dense_columns, csc_vectors) that searches
+        # score against; replaced as a whole so readers never see it half-built
+        self._views = None
+        self._views_stale = True
         self.is_fitted = False
-        self.vectorizer = TfidfVectorizer(
-            max_features=5000,
-            stop_words=None,
-            ngram_range=(1, 2),
-            min_df=1,
-            sublinear_tf=True
-        )
+    
+    def clear_collection(self) -> None:
+        """
+        Clear all documents from the collection.
+        
+        The hashing vectorizer holds no corpus state, so it and the memoized
+        query term vectors are kept; only the index is reset.
+        """
+        with self._index_lock:
+            self._reset_index()
         print("✓ Collection cleared successfully")
     
+    def _term_frequencies(self, texts: List[str]) -> sparse.csr_matrix:
+        """Hash texts into sublinear (1 + log tf) term-frequency rows."""
+        n_jobs = cpu_count()
+        if len(texts) >= PARALLEL_HASH_MIN_TEXTS and n_jobs > 1:
+            # The feature space is fixed, so contiguous slices hash independently;
+            # tokenization holds the GIL, hence processes rather than threads
+            bounds = np.linspace(0, len(texts), n_jobs + 1).astype(int)
+            parts = Parallel(n_jobs=n_jobs)(
+                delayed(self.vectorizer.transform)(texts[start:end])
+                for start, end in zip(bounds[:-1], bounds[1:])
+            )
+            tf = sparse.vstack(parts, format='csr')
+        else:
+            tf = self.vectorizer.transform(texts)
+        np.log(tf.data, out=tf.data)
+        tf.data += 1
+        return tf
+    
+    def _term_frequency_row(self, query: str) -> sparse.csr_matrix:
+        """Term-frequency row for one query (memoized; callers must not modify it)."""
+        return self._term_frequencies([query])
+    
+    def _weight(self, tf: sparse.csr_matrix) -> sparse.csr_matrix:
+        """TF-IDF weighted, L2-normalized copy of term-frequency rows."""
+        # One pass over the nonzeros; the new matrix shares tf's index arrays
+        # (IDF >= 1, so no explicit zeros can appear)
+        data = np.multiply(tf.data, self.idf.take(tf.indices))
+        weighted = sparse.csr_matrix((data, tf.indices, tf.indptr), shape=tf.shape)
+        return normalize(weighted, copy=False)
+    
+    def _ensure_weighted(self) -> None:
+        """Recompute the IDF and re-weight all chunk rows once enough chunks were added."""
+        if not self._needs_weighting():
+            return
+        with self._index_lock:
+            # Another thread may have re-weighted while we waited
+            if not self._needs_weighting():
+                return
+            n = self.tf_vectors.shape[0]
+            # Smoothed IDF, as TfidfVectorizer computes it
+            self.idf = (np.log((n + 1) / (self.doc_freq + 1)) + 1).astype(np.float32)
+            self.idf_rows = n
+            self.chunk_vectors = self._weight(self.tf_vectors)
+            self._views_stale = True
+            # Cached MMR matrices were computed with the previous IDF
+            self._mmr_similarities.cache_clear()
+    
+    def _needs_weighting(self) -> bool:
+        """Whether chunk rows are missing or the IDF is too old for the corpus."""
+        if self.tf_vectors is None:
+            return False
+        n = self.tf_vectors.shape[0]
+        return self.chunk_vectors is None or n - self.idf_rows > IDF_REFRESH_FRACTION * self.idf_rows
+    
+    def _scoring_views(self) -> Tuple:
+        """
+        Snapshot of the matrices search() scores against, rebuilt if chunks changed:
+        dense over the corpus's terms if it fits in DENSE_MAX_BYTES, otherwise CSC
+        for column access.
+        
+        Returns:
+            Tuple of (chunk_vectors, dense_vectors, dense_columns, csc_vectors);
+            either the two dense entries or csc_vectors are None
+        """
+        views = self._views
+        if views is not None and not self._views_stale:
+            return views
+        with self._index_lock:
+            if self._views is not None and not self._views_stale:
+                return self._views
+            chunk_vectors = self.chunk_vectors
+            dense_vectors = dense_columns = csc_vectors = None
+            active = np.flatnonzero(self.doc_freq)
+            if chunk_vectors.shape[0] * len(active) * 4 > DENSE_MAX_BYTES:
+                csc_vectors = chunk_vectors.tocsc()
+            else:
+                dense_columns = np.full(HASH_FEATURES, -1, dtype=np.int64)
+                dense_columns[active] = np.arange(len(active))
+                # Column-major, so the few columns a query touches are contiguous
+                dense_vectors = np.asfortranarray(chunk_vectors[:, active].toarray())
+            # Publish the complete snapshot before clearing the stale flag
+            self._views = (chunk_vectors, dense_vectors, dense_columns, csc_vectors)
+            self._views_stale = False
+            return self._views
+    
+    @staticmethod
+    def _csc_nnz(csc_vectors: sparse.csc_matrix, columns: np.ndarray) -> int:
+        """Number of stored chunk values in the given columns."""
+        indptr = csc_vectors.indptr
+        return int((indptr[columns + 1] - indptr[columns]).sum())
+    
+    def _vectorize_query(self, query: str) -> sparse.csr_matrix:
+        """TF-IDF weighted, L2-normalized query row (requires _ensure_weighted())."""
+        return self._weight(self._query_term_frequencies(query))
+    
     def add_chunks(self, chunks: List) -> None:
         """
         Add document chunks to the store.
@@ -60,19 +232,32 @@ class VectorRetriever:
         if not chunks:
             return
         
-        # Store chunks
-        for chunk in chunks:
-            self.chunks.append({
-                'text': chunk.text,
-                'metadata': chunk.metadata,
-                'chunk_id': chunk.chunk_id
-            })
+        # Vectorize only the new chunks (outside the lock; hashing is stateless)
+        new_texts = [chunk.text for chunk in chunks]
+        new_tf = self._term_frequencies(new_texts)
         
-        # Rebuild TF-IDF vectors
-        texts = [c['text'] for c in self.chunks]
-        self.chunk_vectors = self.vectorizer.fit_transform(texts)
-        self.is_fitted = True
-        print(f"✓ Added {len(chunks)} chunks, total: {len(self.chunks)}")
+        with self._index_lock:
+            # Store chunks
+            start = len(self._texts)
+            self._rows.update((chunk.chunk_id, start + offset) for offset, chunk in enumerate(chunks))
+            self._texts.extend(new_texts)
+            self._metadatas.extend(chunk.metadata for chunk in chunks)
+            self._chunk_ids.extend(chunk.chunk_id for chunk in chunks)
+            
+            # Update document frequencies
+            self.doc_freq += np.bincount(new_tf.indices, minlength=HASH_FEATURES).astype(np.int32)
+            if self.tf_vectors is None:
+                self.tf_vectors = new_tf
+            else:
+                self.tf_vectors = sparse.vstack([self.tf_vectors, new_tf], format='csr')
+            
+            # Append the new rows under the current IDF; _ensure_weighted() refreshes
+            # all rows once the corpus has grown past IDF_REFRESH_FRACTION
+            if self.chunk_vectors is not None:
+                self.chunk_vectors = sparse.vstack([self.chunk_vectors, self._weight(new_tf)], format='csr')
+                self._views_stale = True
+            self.is_fitted = True
+        print(f"✓ Added {len(chunks)} chunks, total: {len(self._texts)}")
     
     def search(self, query: str, top_k: int = 5) -> List[Tuple[str, dict, float]]:
         """
@@ -85,32 +270,113 @@ class VectorRetriever:
         Returns:
             List of (text, metadata, similarity_score) tuples
         """
-        if not self.is_fitted or len(self.chunks) == 0:
-            print(f"[RETRIEVER] No chunks available. is_fitted={self.is_fitted}, chunks={len(self.chunks)}")
+        if not self.is_fitted or len(self._texts) == 0:
+            print(f"[RETRIEVER] No chunks available. is_fitted={self.is_fitted}, chunks={len(self._texts)}")
             return []
         
-        # Transform query using fitted vectorizer
-        query_vector = self.vectorizer.transform([query])
+        self._ensure_weighted()
         
-        # Calculate cosine similarity
-        similarities = cosine_similarity(query_vector, self.chunk_vectors)[0]
+        # Vectorize query with the same term weighting and IDF
+        query_vector = self._vectorize_query(query)
         
-        # Get top-k indices
-        top_indices = np.argsort(similarities)[::-1][:top_k]
+        # Cosine similarity: chunk rows are already L2-normalized, so a dot product suffices
+        chunk_vectors, dense_vectors, dense_columns, csc_vectors = self._scoring_views()
+        if dense_vectors is not None:
+            # Small corpus: BLAS matrix-vector product over the query's columns
+            # (terms absent from the corpus score 0 either way)
+            positions = dense_columns[query_vector.indices]
+            known = positions >= 0
+            similarities = dense_vectors[:, positions[known]] @ query_vector.data[known]
+        elif self._csc_nnz(csc_vectors, query_vector.indices) < CSC_MAX_NNZ_FRACTION * chunk_vectors.nnz:
+            # Large corpus, selective query: only chunks sharing a query term can
+            # score above 0, so accumulate just the query's columns
+            similarities = csc_vectors[:, query_vector.indices] @ query_vector.data
+        else:
+            # Large corpus, common terms: sparse rows times the scattered query
+            # (row-parallel when numba is available)
+            query_dense = np.zeros(HASH_FEATURES, dtype=np.float32)
+            query_dense[query_vector.indices] = query_vector.data
+            similarities = csr_matvec(chunk_vectors, query_dense)
+        
+        retrieved = self._top_results(similarities, top_k)
+        
+        print(f"[RETRIEVER] Found {len(retrieved)} chunks for query")
+        return retrieved
+    
+    @staticmethod
+    def mmr_candidate_count(top_k: int) -> int:
+        """Number of search hits to fetch so MMR can pick a diverse top_k."""
+        return max(top_k, min(top_k * MMR_CANDIDATE_FACTOR, MMR_MAX_CANDIDATES))
+    
+    def _top_results(self, similarities: np.ndarray, top_k: int) -> List[Tuple[str, dict, float]]:
+        """
+        Format the top-k chunks for one query's similarity scores.
+        
+        Args:
+            similarities: Cosine similarity of every chunk to the query
+            top_k: Number of results to return
+            
+        Returns:
+            List of (text, metadata, similarity_score) tuples
+        """
+        # Get top-k indices: partition the nonzero scores, then sort only those k
+        k = min(top_k, len(similarities))
+        candidates = np.flatnonzero(similarities > 0)
+        if len(candidates) < k:
+            # Too few matches; zero-score chunks fill the remaining slots
+            candidates = np.arange(len(similarities))
+        if len(candidates) > k > 0:
+            candidates = candidates[np.argpartition(-similarities[candidates], k - 1)[:k]]
+        top_indices = candidates[np.argsort(-similarities[candidates], kind='stable')][:k]
         
         # Format results - return top chunks even with low similarity
         retrieved = []
         for idx in top_indices:
-            chunk = self.chunks[idx]
             score = float(similarities[idx])
             # Include chunk even with 0 similarity for general queries
-            retrieved.append((chunk['text'], chunk['metadata'], max(score, 0.1)))
-        
-        print(f"[RETRIEVER] Found {len(retrieved)} chunks for query")
+            retrieved.append((self._texts[idx], self._metadatas[idx], max(score, 0.1)))
         return retrieved
     
+    def search_many(self, queries: List[str], top_k: int = 5) -> List[List[Tuple[str, dict, float]]]:
+        """
+        Retrieve top-k chunks for several queries with one matrix-matrix product.
+        
+        Args:
+            queries: User questions
+            top_k: Number of results to retrieve per query
+            
+        Returns:
+            One list of (text, metadata, similarity_score) tuples per query
+        """
+        if not queries:
+            return []
+        if not self.is_fitted or len(self._texts) == 0:
+            print(f"[RETRIEVER] No chunks available. is_fitted={self.is_fitted}, chunks={len(self._texts)}")
+            return [[] for _ in queries]
+        
+        self._ensure_weighted()
+        chunk_vectors, dense_vectors, dense_columns, csc_vectors = self._scoring_views()
+        
+        # Weighted, normalized query rows restricted to the union of their terms
+        query_vectors = self._weight(sparse.vstack([self._query_term_frequencies(q) for q in queries], format='csr'))
+        terms = np.unique(query_vectors.indices)
+        query_terms = query_vectors[:, terms].T.toarray()  # (terms, queries)
+        
+        # One (chunks x terms) @ (terms x queries) product: BLAS GEMM on the dense
+        # copy, or a sparse-dense product over the CSC columns
+        if dense_vectors is not None:
+            positions = dense_columns[terms]
+            known = positions >= 0
+            similarities = dense_vectors[:, positions[known]] @ query_terms[known]
+        else:
+            similarities = csc_vectors[:, terms] @ query_terms
+        
+        results = [self._top_results(similarities[:, i], top_k) for i in range(len(queries))]
+        print(f"[RETRIEVER] Found chunks for {len(queries)} queries")
+        return results
+    
     def rerank_mmr(self, query: str, retrieved_chunks: List[Tuple[str, dict, float]], 
-                   lambda_param: float = 0.5) -> List[Tuple[str, dict, float]]:
+                   lambda_param: float = 0.5, top_k: Optional[int] = None) -> List[Tuple[str, dict, float]]:
         """
         Re-rank retrieved chunks using Maximal Marginal Relevance (MMR).
         Balances relevance to query with diversity among results.
@@ -119,60 +385,65 @@ class VectorRetriever:
             query: User question
             retrieved_chunks: List of (text, metadata, similarity) from search()
             lambda_param: Balance between relevance (1.0) and diversity (0.0)
+            top_k: Number of chunks to select (default: all of retrieved_chunks)
             
         Returns:
             Re-ranked list of (text, metadata, similarity) tuples
         """
-        if len(retrieved_chunks) <= 1:
-            return retrieved_chunks
+        k = len(retrieved_chunks) if top_k is None else min(top_k, len(retrieved_chunks))
+        if len(retrieved_chunks) <= 2:
+            # search() order already puts the most relevant chunk first
+            return retrieved_chunks[:k]
         
-        # Get texts
-        chunk_texts = [chunk[0] for chunk in retrieved_chunks]
+        # Locate the retrieved chunks in the index to reuse their TF-IDF rows
+        rows = tuple(self._rows.get(chunk[1].get('chunk_id'), -1) for chunk in retrieved_chunks)
+        if -1 in rows:
+            print("[RETRIEVER] Chunks not in the index; skipping MMR re-ranking")
+            return retrieved_chunks[:k]
         
-        # Create TF-IDF vectors for chunks and query
-        all_texts = [query] + chunk_texts
-        tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(all_texts)
+        self._ensure_weighted()
+        query_scores, chunk_similarities = self._mmr_similarities(query, rows)
         
-        query_vector = tfidf_matrix[0:1]
-        chunk_vectors = tfidf_matrix[1:]
+        # MMR selection (compiled kernel when numba is available)
+        selected_indices = mmr_select(query_scores, chunk_similarities, k, lambda_param)
         
-        # Calculate query relevance scores
-        query_scores = cosine_similarity(chunk_vectors, query_vector).flatten()
-        
-        # Calculate chunk-to-chunk similarities
-        chunk_similarities = cosine_similarity(chunk_vectors)
+        # Return re-ranked chunks
+        return [retrieved_chunks[i] for i in selected_indices]
+    
+    def _compute_mmr_similarities(self, query: str, rows: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Query relevance and pairwise chunk similarity for MMR (memoized; read-only results).
         
-        # MMR selection
-        selected_indices = []
-        remaining_indices = list(range(len(retrieved_chunks)))
+        Args:
+            query: User question
+            rows: Index rows of the retrieved chunks
+            
+        Returns:
+            Tuple of (query_scores, chunk_similarities)
+        """
+        # Rows and query are already L2-normalized, so dot products are cosines
+        query_vector = self._vectorize_query(query)
+        chunk_vectors, dense_vectors, dense_columns, _ = self._scoring_views()
         
-        # Select first chunk (highest relevance)
-        first_idx = np.argmax(query_scores)
-        selected_indices.append(first_idx)
-        remaining_indices.remove(first_idx)
+        if dense_vectors is not None:
+            # Small corpus: gather the dense rows and use BLAS for both products
+            candidate_vectors = dense_vectors[list(rows)]
+            positions = dense_columns[query_vector.indices]
+            known = positions >= 0
+            query_scores = candidate_vectors[:, positions[known]] @ query_vector.data[known]
+            chunk_similarities = candidate_vectors @ candidate_vectors.T
+        else:
+            # Sparse rows: score only the query's columns (sparse @ dense vector, no
+            # sparse product to densify); the small k x k Gram matrix is densified once
+            candidate_vectors = chunk_vectors[list(rows)]
+            query_scores = candidate_vectors[:, query_vector.indices] @ query_vector.data
+            chunk_similarities = (candidate_vectors @ candidate_vectors.T).toarray()
         
-        # Iteratively select chunks that maximize MMR
-        while remaining_indices:
-            mmr_scores = []
-            
-            for idx in remaining_indices:
-                # Relevance to query
-                relevance = query_scores[idx]
-                
-                # Diversity: max similarity to already selected chunks
-                diversity = max(chunk_similarities[idx][sel_idx] for sel_idx in selected_indices)
-                
-                # MMR score
-                mmr = lambda_param * relevance - (1 - lambda_param) * diversity
-                mmr_scores.append(mmr)
-            
-            # Select chunk with highest MMR
-            best_idx = remaining_indices[np.argmax(mmr_scores)]
-            selected_indices.append(best_idx)
-            remaining_indices.remove(best_idx)
+        # Contiguous float32 buffers go straight into the MMR kernel without copies
+        query_scores = np.ascontiguousarray(query_scores, dtype=np.float32)
+        chunk_similarities = np.ascontiguousarray(chunk_similarities, dtype=np.float32)
         
-        # Return re-ranked chunks
-        return [retrieved_chunks[i] for i in selected_indices]
+        return query_scores, chunk_similarities
     
     def retrieve_and_rerank(self, query: str, top_k: int = 5) -> List[Tuple[str, dict, float]]:
         """
@@ -185,10 +456,10 @@ class VectorRetriever:
         Returns:
             Re-ranked list of (text, metadata, similarity) tuples
         """
-        # Step 1: TF-IDF similarity search
-        retrieved = self.search(query, top_k=top_k)
+        # Step 1: TF-IDF similarity search for a wider candidate pool
+        retrieved = self.search(query, top_k=self.mmr_candidate_count(top_k))
         
-        # Step 2: MMR re-ranking for diversity
-        reranked = self.rerank_mmr(query, retrieved)
+        # Step 2: MMR re-ranking for diversity, keeping top_k
+        reranked = self.rerank_mmr(query, retrieved, top_k=top_k)
         
         return reranked
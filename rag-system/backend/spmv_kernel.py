@@ -0,0 +1,49 @@
+"""
+Numba-accelerated sparse matrix-vector product for RAG system.
+Falls back to SciPy when numba is not installed.
+Domain: Academic & Research Documents (AI & ML PDFs)
+"""
+
+import numpy as np
+from scipy import sparse
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _csr_matvec_jit(data: np.ndarray, indices: np.ndarray, indptr: np.ndarray,
+                        vector: np.ndarray) -> np.ndarray:
+        """Row-parallel CSR times dense vector."""
+        n = indptr.shape[0] - 1
+        out = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            total = 0.0
+            for j in range(indptr[i], indptr[i + 1]):
+                total += data[j] * vector[indices[j]]
+            out[i] = total
+        return out
+
+    # Compile at import so the first query does not pay JIT latency
+    _csr_matvec_jit(np.ones(1, dtype=np.float32), np.zeros(1, dtype=np.int32),
+                    np.array([0, 1], dtype=np.int32), np.ones(1, dtype=np.float32))
+
+
+def csr_matvec(matrix: sparse.csr_matrix, vector: np.ndarray) -> np.ndarray:
+    """
+    Multiply a float32 CSR matrix by a dense vector.
+
+    Args:
+        matrix: Sparse matrix of shape (n, d)
+        vector: Dense float32 vector of shape (d,)
+
+    Returns:
+        Dense float32 vector of shape (n,)
+    """
+    if NUMBA_AVAILABLE:
+        return _csr_matvec_jit(matrix.data, matrix.indices, matrix.indptr, vector)
+    return np.asarray(matrix @ vector, dtype=np.float32)